@@ -1,16 +1,51 @@
 """
 A python/tkinter text file editor and component.
 """
-import os, sys
+import os, sys, re, atexit, bisect, queue, threading, time
+startTime = time.perf_counter()             # for --profile-startup
+
 from tkinter import *
 from tkinter import ttk
-from tkinter.filedialog import SaveAs, asksaveasfilename, askopenfilename
+from tkinter.font import Font
+from tkinter.filedialog import (SaveAs, asksaveasfilename, askopenfilename,
+                                askdirectory)
 from tkinter.messagebox import showerror, showinfo, askyesno
 from tkinter.simpledialog import askstring, askinteger
 from tkinter.colorchooser import askcolor
 from p_python.GUI.Tools.guimaker import *
 from p_python.GUI.Tools.windows import _window
 
+if __name__ == '__main__':
+    from textio import (openBytes, closeBytes, decodeChunks,
+                        detectEncoding, saveChunks)
+    from bigfile import MappedLines
+    from piecetable import PieceTable
+    from redirector import WidgetRedirector
+    from findfiles import FileSearch, poolContext
+    from diff import diffTexts
+    from latency import CommandTimer
+    import instance
+    import journal
+    from undo import UndoHistory
+    from syntax import LineStates, scanLine, scanStates
+    from matchindex import (MatchIndex, findAll, replacements,
+                            searchPattern)
+else:
+    from p_python.TextEditor.textio import (openBytes, closeBytes,
+                                            decodeChunks, detectEncoding,
+                                            saveChunks)
+    from p_python.TextEditor.bigfile import MappedLines
+    from p_python.TextEditor.piecetable import PieceTable
+    from p_python.TextEditor.redirector import WidgetRedirector
+    from p_python.TextEditor.findfiles import FileSearch, poolContext
+    from p_python.TextEditor.diff import diffTexts
+    from p_python.TextEditor.latency import CommandTimer
+    from p_python.TextEditor import instance, journal
+    from p_python.TextEditor.undo import UndoHistory
+    from p_python.TextEditor.syntax import LineStates, scanLine, scanStates
+    from p_python.TextEditor.matchindex import (MatchIndex, findAll,
+                                                replacements, searchPattern)
+
 try:
     import textConfig
     configs = textConfig.__dict__
@@ -37,6 +72,1154 @@ FontScale = 0
 if sys.platform == 'win':
     FontScale = 3
 
+commandTimer = None                     # see timeCommands
+
+def timeCommands():
+    """
+    time menu commands and key bindings of editors made from now on,
+    dumping the statistics at exit; off by default, when callbacks
+    are installed unwrapped and cost nothing extra
+    """
+    global commandTimer
+    if commandTimer is None:
+        commandTimer = CommandTimer(configs.get('commandSlowMs', 100),
+                                    configs.get('commandLog', ''))
+        atexit.register(commandTimer.dump)
+        for name in modalDialogs:
+            globals()[name] = untimed(globals()[name])
+    return commandTimer
+
+# the time a command spends waiting on one of these is the user's
+modalDialogs = ['askopenfilename', 'asksaveasfilename', 'askdirectory',
+                'askstring', 'askinteger', 'askcolor', 'askyesno',
+                'showinfo', 'showerror']
+
+def untimed(dialog):
+    """
+    dialog, with the command timer paused while it is up
+    """
+    def call(*args, **kargs):
+        commandTimer.pause()
+        try:
+            return dialog(*args, **kargs)
+        finally:
+            commandTimer.resume()
+    return call
+
+if configs.get('commandTiming', False):
+    timeCommands()
+
+def makeProgressBar(editor, label, maximum, cancel):
+    """
+    (frame, bar) for a long job, packed above the editor's text,
+    with a Cancel button
+    """
+    frame = Frame(editor, relief=SUNKEN, bd=1)
+    Label(frame, text=label).pack(side=LEFT)
+    Button(frame, text='Cancel', command=cancel).pack(side=RIGHT)
+    bar = ttk.Progressbar(frame, mode='determinate', maximum=max(maximum, 1))
+    bar.pack(side=LEFT, fill=X, expand=YES, padx=5)
+    frame.pack(side=BOTTOM, fill=X, before=editor.text)
+    return frame, bar
+
+class ChunkedLoader:
+    """
+    feed a mapped file into an editor's Text widget a chunk at a time
+    from after() callbacks, with a progress bar and Cancel button;
+    a failed encoding guess restarts the decode from the same bytes
+    """
+    def __init__(self, editor, file, data, encodings, then=None):
+        self.editor = editor
+        self.then = then                # called once the file is in
+        self.text = editor.text
+        self.file = file
+        self.data = data
+        self.encodings = encodings
+        self.chunksize = configs.get('loadChunkSize', 256 * 1024)
+        self.chunks = None
+        self.encoding = None
+        self.pending = None
+
+    def start(self):
+        self.text.config(state=NORMAL)
+        self.text.delete('1.0', END)
+        self.text.config(state=DISABLED)
+        self.makeProgress()
+        self.nextEncoding()
+
+    def makeProgress(self):
+        self.bar, self.progress = makeProgressBar(
+                                    self.editor,
+                                    'Loading ' + os.path.basename(self.file),
+                                    len(self.data), self.cancel)
+
+    def nextEncoding(self):
+        try:
+            self.encoding = next(self.encodings)
+        except StopIteration:
+            self.close()
+            showerror('PyNote', 'Could not decode and open file ' + self.file)
+            return
+        self.text.config(state=NORMAL)
+        self.text.delete('1.0', END)
+        self.text.config(state=DISABLED)
+        self.chunks = decodeChunks(self.data, self.encoding or 'latin-1',
+                                   self.chunksize)
+        self.pending = self.text.after(1, self.step)
+
+    def step(self):
+        try:
+            pos, text = next(self.chunks)
+        except StopIteration:
+            self.finish()
+            return
+        except (UnicodeError, LookupError):
+            self.nextEncoding()
+            return
+        try:
+            self.text.config(state=NORMAL)
+            self.editor.redirector.original('insert', END, text)
+            self.editor.document.append(text)
+            self.text.config(state=DISABLED)
+            self.progress.config(value=pos)
+        except TclError:                           # window closed mid-load
+            self.close()
+            return
+        self.pending = self.text.after(1, self.step)
+
+    def finish(self):
+        self.close()
+        editor = self.editor
+        editor.setFileName(self.file)
+        editor.knownEncoding = self.encoding
+        editor.notifyEdit('reset', 0, '')
+        editor.journal.clean(self.file, self.encoding)
+        self.text.mark_set(INSERT, '1.0')
+        self.text.see(INSERT)
+        self.text.edit_reset()
+        self.text.edit_modified(0)
+        if self.then:
+            self.then()
+
+    def cancel(self):
+        if self.chunks is None:
+            return
+        self.close()
+        self.text.delete('1.0', END)
+        self.text.edit_reset()
+        self.text.edit_modified(0)
+        self.editor.setFileName(None)
+        self.editor.knownEncoding = None
+        self.editor.journal.clean()
+
+    def close(self):
+        if self.pending:
+            self.text.after_cancel(self.pending)
+            self.pending = None
+        self.chunks = None
+        closeBytes(self.data)
+        if self.editor.loader is self:
+            self.editor.loader = None
+        try:
+            self.bar.destroy()
+            self.text.config(state=NORMAL)
+        except TclError:
+            pass
+
+class ChunkedInserter:
+    """
+    insert a large text a chunk at a time from after() callbacks, with
+    progress and Cancel; other edits are refused with a bell until it
+    is done, and the whole insert is one undo step, or none if cancelled
+    """
+    busyMessage = 'Inserting: edits are refused until done or cancelled'
+
+    def __init__(self, editor, index, chars):
+        self.editor = editor
+        self.text = editor.text
+        self.chars = chars
+        self.pos = 0
+        self.busy = False               # our own insert is under way
+        self.then = []                  # callables run when done
+        self.chunksize = configs.get('insertChunkSize', 256 * 1024)
+        self.start = editor.textOffset(index)
+        self.text.mark_set('chunkinsert', index)
+        self.text.mark_gravity('chunkinsert', RIGHT)
+        editor.history.beginGroup()
+        self.undoStep = editor.history.undos[-1]  # maybe an enclosing group's
+        self.bar, self.progress = makeProgressBar(editor, 'Inserting',
+                                                  len(chars), self.cancel)
+        self.pending = self.text.after(1, self.step)
+
+    def step(self):
+        chunk = self.chars[self.pos:self.pos + self.chunksize]
+        self.busy = True
+        try:
+            self.text.insert('chunkinsert', chunk)
+        finally:
+            self.busy = False
+        self.pos += len(chunk)
+        self.progress['value'] = self.pos
+        if self.pos < len(self.chars):
+            self.pending = self.text.after(1, self.step)
+        else:
+            self.pending = None
+            self.close()
+            self.text.mark_set(INSERT, self.editor.textIndex(self.start +
+                                                             len(self.chars)))
+            self.text.see(INSERT)
+            for action in self.then:
+                action()
+
+    def cancel(self):
+        """
+        stop, and take back the whole undo step the insert is part of:
+        what was inserted so far, and edits grouped with it (the delete
+        of a Replace All)
+        """
+        if self.pending:
+            self.text.after_cancel(self.pending)
+            self.pending = None
+        self.close()
+        history = self.editor.history
+        if history.undos and history.undos[-1] is self.undoStep:
+            self.editor.onUndo()
+            history.dropRedos()
+
+    def close(self):
+        self.editor.inserter = None
+        self.editor.history.endGroup()
+        if self.editor.message.cget('text') == self.busyMessage:
+            self.editor.setMessage('')
+        self.text.mark_unset('chunkinsert')
+        try:
+            self.bar.destroy()
+        except TclError:
+            pass
+
+class MappedViewer:
+    """
+    read-only view of a memory-mapped file: only the lines in sight are
+    put in the Text widget, and the scrollbar maps to byte offsets, so
+    files of any size open at once in flat memory
+    """
+    keys = ['<Up>', '<Down>', '<Prior>', '<Next>', '<Control-Home>',
+            '<Control-End>', '<MouseWheel>', '<Button-4>', '<Button-5>',
+            '<Configure>', '<ButtonRelease-1>', '<Shift-Button-1>']
+
+    def __init__(self, editor, lines, encoding):
+        self.editor = editor
+        self.text = editor.text
+        self.raw = editor.redirector.original     # not a document edit
+        self.lines = lines
+        self.encoding = encoding
+        self.top = 0                # byte offset of the first shown line
+        self.shown = []             # (offset, decoded line) in the widget
+        self.anchor = None          # byte offset of last click
+        self.selection = None       # (start, end) byte offsets
+        self.pending = None
+        self.text.config(yscrollcommand=lambda *args: None)
+        editor.vbar.config(command=self.yview)
+        self.bindKeys()
+        self.render()
+        self.pending = self.text.after(100, self.indexStep)
+
+    def bindKeys(self):
+        """
+        bind alongside the editor's own handlers (the status bar and
+        gutter still need <Configure> and clicks); close puts back the
+        bindings saved here
+        """
+        self.saved = {key: self.text.bind(key) for key in self.keys}
+        self.funcids = []
+        def bind(key, action):
+            self.funcids.append(self.text.bind(key, action, add='+'))
+        bind('<Up>', lambda event: self.scroll(-1))
+        bind('<Down>', lambda event: self.scroll(+1))
+        bind('<Prior>', lambda event: self.scroll(1 - self.rows()))
+        bind('<Next>', lambda event: self.scroll(self.rows() - 1))
+        bind('<Control-Home>', lambda event: self.moveTo(0))
+        bind('<Control-End>', lambda event: self.moveTo(self.lines.size))
+        bind('<MouseWheel>', lambda event: self.scroll(-3 if event.delta > 0
+                                                       else 3))
+        bind('<Button-4>', lambda event: self.scroll(-3))
+        bind('<Button-5>', lambda event: self.scroll(+3))
+        bind('<Configure>', lambda event: self.render())
+        bind('<ButtonRelease-1>', self.onRelease)
+        bind('<Shift-Button-1>', self.onExtend)
+
+    def close(self):
+        if self.pending:
+            self.text.after_cancel(self.pending)
+        for key in self.keys:
+            self.text.bind(key, self.saved[key])
+        for funcid in self.funcids:
+            self.text.deletecommand(funcid)
+        self.text.config(state=NORMAL, yscrollcommand=self.editor.onTextScroll)
+        self.editor.vbar.config(command=self.text.yview)
+        self.raw('delete', '1.0', END)
+        self.lines.close()
+
+    def indexStep(self):
+        """
+        index line offsets in the background, a slice per callback
+        """
+        if self.lines.extendIndex(8 * 1024 * 1024):
+            self.pending = None
+        else:
+            self.pending = self.text.after(10, self.indexStep)
+
+    # display
+
+    def rows(self):
+        linespace = Font(font=self.text['font']).metrics('linespace')
+        height = self.text.winfo_height() // max(linespace, 1)
+        return max(height, int(self.text['height']), 1)
+
+    def render(self):
+        rows = self.rows()
+        lines = self.lines.linesFrom(self.top, rows + 1)
+        self.shown = [(offset, line.decode(self.encoding, 'replace'))
+                      for (offset, line) in lines]
+        self.text.config(state=NORMAL)
+        self.raw('delete', '1.0', END)
+        self.raw('insert', '1.0', '\n'.join(line for (o, line) in self.shown))
+        self.tagSelection()
+        self.text.config(state=DISABLED)
+        size = self.lines.size or 1
+        bottom = lines[rows][0] if len(lines) > rows else size
+        self.editor.vbar.set(self.top / size, bottom / size)
+
+    def tagSelection(self):
+        self.text.tag_remove(SEL, '1.0', END)
+        if self.selection and self.shown:
+            start, end = self.selection
+            first = max(start, self.top)
+            last = min(end, self.bottom())
+            if first < last:
+                self.text.tag_add(SEL, self.indexOf(first),
+                                       self.indexOf(last))
+
+    def bottom(self):
+        offset, line = self.shown[-1]
+        return offset + len(line.encode(self.encoding, 'replace'))
+
+    # scrolling
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.moveTo(int(float(args[1]) * self.lines.size))
+        elif args[0] == 'scroll':
+            count = int(args[1])
+            if args[2] == 'pages':
+                count *= self.rows() - 1
+            self.scroll(count)
+
+    def moveTo(self, offset):
+        last = self.lines.lastPage(self.rows())
+        self.top = min(self.lines.lineStart(offset), last)
+        self.render()
+        return 'break'
+
+    def scroll(self, count):
+        top = self.top
+        if count > 0:
+            for i in range(count):
+                line, next = self.lines.readLine(top)
+                if next >= self.lines.size:
+                    break
+                top = next
+            top = min(top, self.lines.lastPage(self.rows()))
+        else:
+            top = self.lines.backLines(top, -count)
+        self.top = top
+        self.render()
+        return 'break'
+
+    # index <-> byte offset mapping
+
+    def offsetOf(self, index):
+        line, col = map(int, self.text.index(index).split('.'))
+        if not self.shown:
+            return 0
+        if line > len(self.shown):
+            return self.bottom()
+        offset, text = self.shown[line-1]
+        return offset + len(text[:col].encode(self.encoding, 'replace'))
+
+    def indexOf(self, offset):
+        starts = [start for (start, line) in self.shown]
+        row = max(bisect.bisect_right(starts, offset) - 1, 0)
+        start = starts[row]
+        prefix = self.lines.bytes(start, offset)
+        return '%d.%d' % (row + 1, len(prefix.decode(self.encoding, 'replace')))
+
+    # selection, goto, find
+
+    def onRelease(self, event):
+        if self.text.tag_ranges(SEL):
+            self.selection = (self.offsetOf(SEL_FIRST), self.offsetOf(SEL_LAST))
+        else:
+            self.selection = None
+        self.anchor = self.offsetOf('@%d,%d' % (event.x, event.y))
+
+    def onExtend(self, event):
+        """
+        shift-click extends the selection from the last click, even if
+        it has scrolled out of the widget
+        """
+        here = self.offsetOf('@%d,%d' % (event.x, event.y))
+        if self.anchor is not None:
+            self.selection = (min(self.anchor, here), max(self.anchor, here))
+            self.render()
+        return 'break'
+
+    def selectAll(self):
+        self.selection = (0, self.lines.size)
+        self.render()
+
+    def selectedText(self):
+        """
+        decoded selection from the mapped bytes, or None if too big
+        """
+        if not self.selection:
+            return ''
+        start, end = self.selection
+        if end - start > configs.get('viewCopyLimit', 64 * 1024 * 1024):
+            return None
+        return self.lines.bytes(start, end).decode(self.encoding, 'replace')
+
+    def gotoLine(self, lineno):
+        offset = self.lines.lineOffset(lineno)
+        if offset is None:
+            return False
+        line, next = self.lines.readLine(offset)
+        self.selection = (offset, next)
+        self.moveTo(offset)
+        return True
+
+    def find(self, key, nocase, backwards=False, regex=False):
+        """
+        search the mapped bytes after (or before) the selection or view
+        top; returns True if found and shown
+        """
+        pattern, reach = searchPattern(key.encode(self.encoding), nocase,
+                                       regex)
+        if backwards:
+            end = self.selection[0] if self.selection else self.top
+            match = self.lines.findBefore(pattern, end)
+        else:
+            start = self.selection[1] if self.selection else self.top
+            match = self.lines.find(pattern, start)
+        if not match:
+            return False
+        self.selection = match.span()
+        self.moveTo(match.start())
+        return True
+
+class BackgroundSave:
+    """
+    encode and write a snapshot of an editor's document on a worker
+    thread; the encoding ladder, dialogs and widget updates all stay
+    on the GUI thread, which polls for the write's end with after()
+    """
+    def __init__(self, editor, filename, encodings, quiet=False):
+        self.editor = editor
+        self.filename = filename
+        self.encodings = encodings
+        self.quiet = quiet                      # autosaves never pop up
+        self.snapshot = editor.document.snapshot()
+        self.changes = editor.changes
+        self.chunksize = configs.get('saveChunkSize', 256 * 1024)
+        self.problem = None
+        self.thread = None
+        self.pending = None
+
+    def start(self):
+        self.editor.setSaveState(' [saving]')
+        self.nextEncoding()
+
+    def nextEncoding(self):
+        try:
+            self.encoding = next(self.encodings)
+        except StopIteration:
+            self.failed('Could not encode for file %s\n%s' %
+                        (self.filename, self.problem))
+            return
+        self.result = None
+        self.thread = threading.Thread(target=self.write)
+        self.thread.start()
+        self.pending = self.editor.after(50, self.poll)
+
+    def write(self):
+        # worker thread: no tkinter calls in here
+        try:
+            saveChunks(self.filename,
+                       self.snapshot.chunks(size=self.chunksize),
+                       self.encoding)
+        except Exception as why:
+            self.result = why
+
+    def poll(self):
+        self.pending = None
+        if self.thread.is_alive():
+            self.pending = self.editor.after(50, self.poll)
+        else:
+            self.finish()
+
+    def wait(self):
+        """
+        block until the save is done, dialogs and all
+        """
+        while self.editor.saver is self:
+            if self.pending:
+                self.editor.after_cancel(self.pending)
+                self.pending = None
+            self.thread.join()
+            self.finish()
+
+    def finish(self):
+        why = self.result
+        if isinstance(why, (UnicodeError, LookupError)):
+            self.problem = why
+            self.nextEncoding()
+        elif why:
+            self.failed('Could not save file ' + self.filename)
+        else:
+            editor = self.editor
+            editor.saver = None
+            editor.setSaveState('')
+            editor.setFileName(self.filename)
+            editor.knownEncoding = self.encoding
+            if editor.changes == self.changes:      # nothing typed since
+                editor.text.edit_modified(0)
+                editor.journal.clean(self.filename, self.encoding)
+            else:
+                editor.journal.rebase()             # the file was the baseline
+            if editor.saveAgain:
+                editor.saveAgain = False
+                editor.onSave()
+
+    def failed(self, message):
+        self.editor.saver = None
+        self.editor.saveAgain = False
+        self.editor.setSaveState(' [not saved]')
+        if not self.quiet:
+            showerror('PyNote', message)
+
+class FindResults:
+    """
+    results pane for a Find in Files run: polls the search's queue
+    from after() callbacks, so hits appear as workers report them
+    """
+    def __init__(self, editor, search, key):
+        self.editor = editor
+        self.search = search
+        self.hits = []
+        self.window = Toplevel(editor)
+        self.window.title('PyNote-Find in Files: ' + key)
+        self.status = Label(self.window, anchor=W, text='Searching...')
+        self.status.pack(side=TOP, fill=X)
+        Button(self.window, text='Cancel', command=self.search.cancel
+               ).pack(side=BOTTOM, anchor=E)
+        bar = Scrollbar(self.window)
+        self.list = Listbox(self.window, width=100, height=20)
+        bar.config(command=self.list.yview)
+        self.list.config(yscrollcommand=bar.set)
+        bar.pack(side=RIGHT, fill=Y)
+        self.list.pack(side=LEFT, fill=BOTH, expand=YES)
+        self.list.bind('<Double-1>', self.onPick)
+        self.list.bind('<Return>', self.onPick)
+        self.window.protocol('WM_DELETE_WINDOW', self.onClose)
+        self.search.start()
+        self.window.after(100, self.poll)
+
+    def poll(self):
+        lines = []
+        done = False
+        while len(lines) < 5000:
+            try:
+                hits = self.search.results.get_nowait()
+            except queue.Empty:
+                break
+            if hits is None:
+                done = True
+                break
+            self.hits.extend(hits)
+            lines.extend('%s:%d: %s' % (path, line, text)
+                         for (path, line, col, text) in hits)
+        try:
+            if lines:
+                self.list.insert(END, *lines)
+            found = '%d hits in %d files' % (len(self.hits), self.search.files)
+            if done:
+                capped = self.search.cancelled.is_set()
+                self.status.config(text=found + (' (stopped)' if capped else ''))
+            else:
+                self.status.config(text='Searching... ' + found)
+                self.window.after(100, self.poll)
+        except TclError:                            # pane was closed
+            self.search.cancel()
+
+    def onPick(self, event):
+        selection = self.list.curselection()
+        if selection:
+            path, line, col, text = self.hits[int(selection[0])]
+            self.editor.openAt(path, line, col)
+
+    def onClose(self):
+        self.search.cancel()
+        self.window.destroy()
+
+class CompareView:
+    """
+    an editor's text and a file side by side in two editor components;
+    the line diff runs in a worker process, the panes scroll together
+    line for line, and changes are stepped through with Next/Previous
+    """
+    def __init__(self, editor, file):
+        self.editor = editor
+        self.file = file
+        self.hunks = None
+        self.starts = None              # hunk starts per pane, for bisect
+        self.current = -1
+        self.shown = {}                 # pane: top line we last moved it to
+        self.executor = self.future = None
+        self.waiting = 2                # panes still loading
+        name = os.path.basename(editor.currfile or '') or 'Untitled'
+        self.window = Toplevel(editor)
+        self.window.title('PyNote-Compare: %s with %s' %
+                          (name, os.path.basename(file)))
+        tools = Frame(self.window)
+        tools.pack(side=TOP, fill=X)
+        Button(tools, text='Previous Change', command=self.onPrev
+               ).pack(side=LEFT)
+        Button(tools, text='Next Change', command=self.onNext).pack(side=LEFT)
+        self.status = Label(tools, anchor=W, text='Loading...')
+        self.status.pack(side=LEFT, fill=X, expand=YES)
+        self.left = self.makePane(name + ' (this window)')
+        self.right = self.makePane(file)
+        self.window.bind('<Alt-Down>', self.onNext)
+        self.window.bind('<Alt-Up>', self.onPrev)
+        self.window.protocol('WM_DELETE_WINDOW', self.onClose)
+
+        self.left.setAllText(editor.getAllText())
+        self.left.whenInserted(self.loaded)
+        self.right.onOpen(file, then=self.loaded)
+
+    def makePane(self, name):
+        column = Frame(self.window)
+        column.pack(side=LEFT, fill=BOTH, expand=YES)
+        Label(column, anchor=W, text=name).pack(side=TOP, fill=X)
+        pane = TextEditorComponent(column)
+        pane.journal.enabled = False
+        pane.text.config(yscrollcommand=lambda first, last:
+                                        self.onScroll(pane, first, last))
+        colours = configs.get('compareColours', {})
+        pane.text.tag_config('diffold', background=colours.get('removed',
+                                                                '#ffd8d8'))
+        pane.text.tag_config('diffnew', background=colours.get('added',
+                                                                '#d8ffd8'))
+        pane.text.tag_config('diffcurrent', background=colours.get('current',
+                                                                    '#ffff99'))
+        return pane
+
+    def loaded(self):
+        self.waiting -= 1
+        if self.waiting:
+            return
+        # not needed until a compare
+        from concurrent.futures import ProcessPoolExecutor
+        for pane in (self.left, self.right):
+            pane.clearModified()
+            pane.text.config(state=DISABLED)    # the diff must stay true
+        self.status.config(text='Comparing...')
+        self.executor = ProcessPoolExecutor(
+                            1, mp_context=poolContext(diffTexts.__module__))
+        self.future = self.executor.submit(diffTexts, self.left.getAllText(),
+                                           self.right.getAllText())
+        self.executor.shutdown(wait=False)
+        self.window.after(100, self.poll)
+
+    def poll(self):
+        try:
+            if not self.future.done():
+                self.window.after(100, self.poll)
+                return
+            try:
+                self.show(self.future.result())
+            except Exception as why:
+                self.status.config(text='Compare failed: %s' % why)
+        except TclError:                            # view was closed
+            pass
+
+    def show(self, hunks):
+        self.hunks = hunks
+        self.starts = {self.left: [hunk[0] for hunk in hunks],
+                       self.right: [hunk[2] for hunk in hunks]}
+        for (pane, tag, first) in ((self.left, 'diffold', 0),
+                                   (self.right, 'diffnew', 2)):
+            ranges = []
+            for hunk in hunks:
+                if hunk[first] < hunk[first + 1]:
+                    ranges += ['%d.0' % (hunk[first] + 1),
+                               '%d.0' % (hunk[first + 1] + 1)]
+            for i in range(0, len(ranges), 2000):   # many ranges per call
+                pane.text.tag_add(tag, *ranges[i:i + 2000])
+            pane.text.tag_raise('diffcurrent')
+        removed = sum(a1 - a0 for (a0, a1, b0, b1) in hunks)
+        added = sum(b1 - b0 for (a0, a1, b0, b1) in hunks)
+        if hunks:
+            self.status.config(text='%d changes: %d lines removed, %d added' %
+                                    (len(hunks), removed, added))
+        else:
+            self.status.config(text='No differences')
+
+    def other(self, pane):
+        return self.right if pane is self.left else self.left
+
+    def mapLine(self, pane, line):
+        """
+        0-based line in the other pane that lines up with pane's line
+        """
+        i = bisect.bisect_right(self.starts[pane], line) - 1
+        if i < 0:
+            return line
+        a0, a1, b0, b1 = self.hunks[i]
+        if pane is self.right:
+            a0, a1, b0, b1 = b0, b1, a0, a1
+        if line < a1:
+            return b0 + min(line - a0, max(b1 - b0 - 1, 0))
+        return line - a1 + b1
+
+    def topLine(self, pane):
+        return int(pane.text.index('@0,0').split('.')[0]) - 1
+
+    def scrollTo(self, pane, line):
+        pane.text.yview('%d.0' % (line + 1))
+        self.shown[pane] = self.topLine(pane)
+
+    def onScroll(self, pane, first, last):
+        pane.onTextScroll(first, last)
+        if self.hunks is None:
+            return
+        top = self.topLine(pane)
+        if self.shown.pop(pane, None) == top:
+            return                                  # our own scroll echoing
+        other = self.other(pane)
+        line = self.mapLine(pane, top)
+        if self.topLine(other) != line:
+            self.scrollTo(other, line)
+
+    def onNext(self, event=None):
+        if self.hunks:
+            self.showChange(min(self.current + 1, len(self.hunks) - 1))
+
+    def onPrev(self, event=None):
+        if self.hunks:
+            self.showChange(max(self.current - 1, 0))
+
+    def showChange(self, index):
+        self.current = index
+        a0, a1, b0, b1 = self.hunks[index]
+        for (pane, first, last) in ((self.left, a0, a1), (self.right, b0, b1)):
+            pane.text.tag_remove('diffcurrent', '1.0', END)
+            if first < last:
+                pane.text.tag_add('diffcurrent', '%d.0' % (first + 1),
+                                  '%d.0' % (last + 1))
+            pane.text.mark_set(INSERT, '%d.0' % (first + 1))
+            self.scrollTo(pane, max(first - 3, 0))
+        self.status.config(text='change %d of %d' % (index + 1,
+                                                     len(self.hunks)))
+
+    def onClose(self):
+        if self.future:
+            self.future.cancel()
+        for pane in (self.left, self.right):
+            pane.onCancelLoad()
+        self.window.destroy()
+
+class StatusBar(Frame):
+    """
+    cursor position, totals, selection size, encoding and the find
+    status under the text; totals are kept from edit deltas, and the labels are redrawn
+    at most once a frame, so the cost per keystroke is independent of
+    the size of the file
+    """
+    frameDelay = 16                     # msecs: one redraw per frame
+
+    def __init__(self, editor):
+        Frame.__init__(self, editor, relief=SUNKEN, bd=1)
+        self.editor = editor
+        self.fields = {}
+        for (name, width) in (('history', 14), ('encoding', 10), ('selection', 16),
+                              ('totals', 30), ('position', 18), ('search', 18)):
+            label = Label(self, anchor=W, width=width, relief=GROOVE, bd=1)
+            label.pack(side=RIGHT)
+            self.fields[name] = label
+        self.lines = editor.document.lineCount()
+        self.chars = len(editor.document)
+        self.pending = None
+        editor.editHooks.append(self.onEdit)
+        editor.redirector.register('mark', self.onMark)
+        editor.text.bind('<<Selection>>', self.schedule, add='+')
+
+    def show(self, visible=True):
+        if visible:
+            self.pack(side=BOTTOM, fill=X, before=self.editor.hbar)
+            self.schedule()
+        else:
+            self.pack_forget()
+
+    def visible(self):
+        return bool(self.winfo_manager())
+
+    def setSearch(self, text):
+        """
+        the find status, such as 'match 3 of 10': set by searches, not
+        by refresh, so redraws never count matches
+        """
+        self.fields['search'].config(text=text)
+
+    def onEdit(self, kind, offset, text):
+        if kind == 'insert':
+            self.chars += len(text)
+            self.lines += text.count('\n')
+        elif kind == 'delete':
+            self.chars -= len(text)
+            self.lines -= text.count('\n')
+        else:
+            self.lines = self.editor.document.lineCount()
+            self.chars = len(self.editor.document)
+        self.schedule()
+
+    def onMark(self, *args):
+        result = self.editor.redirector.original('mark', *args)
+        if args[:2] == ('set', INSERT):
+            self.schedule()                 # cursor moved
+        return result
+
+    def schedule(self, event=None):
+        if self.pending is None and self.visible():
+            self.pending = self.after(self.frameDelay, self.refresh)
+
+    def refresh(self):
+        self.pending = None
+        editor = self.editor
+        if editor.viewer:
+            viewer = editor.viewer
+            self.fields['position'].config(text='Read-only view')
+            self.fields['totals'].config(text='%d bytes' % viewer.lines.size)
+            self.fields['selection'].config(text='')
+            self.fields['history'].config(text='')
+            self.fields['encoding'].config(text=viewer.encoding)
+            return
+        original = editor.redirector.original
+        where = str(original('index', INSERT))
+        line, col = map(int, where.split('.'))
+        self.fields['position'].config(text='Ln %d, Col %d' % (line, col + 1))
+        self.fields['totals'].config(
+                        text='%d lines, %d chars' % (self.lines, self.chars))
+        selected = original('tag', 'nextrange', SEL, '1.0')
+        if selected:
+            first, last = selected
+            size = editor.textOffset(last) - editor.textOffset(first)
+            self.fields['selection'].config(text='%d selected' % size)
+        else:
+            self.fields['selection'].config(text='')
+        encoding = editor.knownEncoding or editor.openEncoding or 'utf-8'
+        self.fields['encoding'].config(text=encoding)
+        self.fields['history'].config(
+                        text='undo %.1f MB' % (editor.history.usage() / 2**20))
+
+class LineNumbers(Canvas):
+    """
+    line-number gutter drawn on a Canvas for just the lines in view,
+    placed with dlineinfo; redrawn when the view scrolls or the line
+    count changes, so its cost depends on the window, not the file
+    """
+    frameDelay = 16                     # msecs: one redraw per frame
+
+    def __init__(self, editor):
+        Canvas.__init__(self, editor, width=1, highlightthickness=0,
+                        bg=configs.get('gutterBg', 'gray92'))
+        self.editor = editor
+        self.text = editor.text
+        self.pending = None
+        self.digits = 0
+        self.fontSpec = None
+        editor.editHooks.append(self.onEdit)
+        self.bind('<Configure>', self.schedule)
+
+    def show(self, visible=True):
+        if visible:
+            self.pack(side=LEFT, fill=Y, before=self.text)
+            self.schedule()
+        else:
+            self.pack_forget()
+
+    def visible(self):
+        return bool(self.winfo_manager())
+
+    def onEdit(self, kind, offset, text):
+        # same line count and no wrapping: every number stays put
+        if ('\n' in text or kind == 'reset' or
+                str(self.text.cget('wrap')) != 'none'):
+            self.schedule()
+
+    def schedule(self, event=None):
+        if self.pending is None and self.visible():
+            self.pending = self.after(self.frameDelay, self.redraw)
+
+    def redraw(self):
+        self.pending = None
+        self.delete(ALL)
+        if self.editor.viewer:
+            return                          # viewer lines are not numbered
+        spec = str(self.text.cget('font'))
+        if spec != self.fontSpec:
+            self.fontSpec = spec
+            self.font = Font(font=spec)
+            self.digits = 0
+        font = self.font
+        total = self.editor.document.lineCount()
+        digits = max(len(str(total)), 2)
+        if digits != self.digits:
+            self.digits = digits
+            self.config(width=font.measure('0' * digits) + 8)
+        right = int(self.cget('width')) - 4
+        index = self.text.index('@0,0')
+        while True:
+            info = self.text.dlineinfo(index)
+            if info is None:
+                break                       # below the bottom of the view
+            line = index.split('.')[0]
+            self.create_text(right, info[1], anchor=NE, text=line,
+                             font=font, fill='gray40')
+            if int(line) >= total:
+                break                       # last line of the text
+            index = '%d.0' % (int(line) + 1)
+
+class SyntaxHighlighter:
+    """
+    Python syntax colouring: line start states are rescanned on a
+    worker thread from a document snapshot, only from an edit on until
+    they settle; tags are applied to the lines in view alone
+    """
+    kinds = ['comment', 'string', 'keyword', 'builtin', 'definition',
+             'decorator', 'number']
+    batch = 2000                        # lines per worker job
+    frameDelay = 16
+
+    def __init__(self, editor):
+        self.editor = editor
+        self.text = editor.text
+        self.lines = LineStates()
+        self.active = False
+        self.generation = 0             # bumped by each edit
+        self.busy = False               # a job is with the worker
+        self.pending = None
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.worker = None
+        colours = configs.get('syntaxColours', {})
+        for kind in self.kinds:
+            self.text.tag_config('syn-' + kind, foreground=colours.get(kind))
+            self.text.tag_lower('syn-' + kind)
+        editor.editHooks.append(self.onEdit)
+
+    def setFile(self, filename):
+        """
+        colour Python files only; called when the file name changes
+        """
+        extensions = configs.get('syntaxExtensions', ('.py', '.pyw'))
+        active = (configs.get('syntaxHighlight', True) and
+                  isinstance(filename, str) and
+                  filename.lower().endswith(tuple(extensions)))
+        if active != self.active:
+            self.active = active
+            if active:
+                self.onEdit('reset', 0, '')
+            else:
+                for kind in self.kinds:
+                    self.text.tag_remove('syn-' + kind, '1.0', END)
+
+    def onEdit(self, kind, offset, text):
+        if not self.active:
+            return
+        self.generation += 1
+        document = self.editor.document
+        if kind == 'reset':
+            self.lines.reset(document.lineCount())
+        else:
+            line = document.position(offset)[0] - 1
+            newlines = text.count('\n')
+            if kind == 'insert':
+                self.lines.onEdit(line, newlines, 0)
+            else:
+                self.lines.onEdit(line, 0, newlines)
+        self.submit()
+        self.schedule()
+
+    # worker thread
+
+    def submit(self):
+        if self.busy or not self.lines.dirty():
+            return
+        if not self.worker:
+            self.worker = threading.Thread(target=self.work, daemon=True)
+            self.worker.start()
+        low, state, old = self.lines.job(self.batch)
+        self.jobs.put((self.generation, self.editor.document.snapshot(),
+                       low, state, old, self.lines.high))
+        self.busy = True
+        self.text.after(self.frameDelay, self.poll)
+
+    def work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:                     # stopped
+                return
+            generation, document, low, state, old, high = job
+            new, next = scanStates(document, low, state, old, high, self.batch)
+            self.results.put((generation, low, new, next))
+
+    def stop(self, event=None):
+        """
+        the editor is being destroyed: end the worker thread, which
+        would otherwise keep it alive
+        """
+        self.active = False
+        if self.pending is not None:
+            self.text.after_cancel(self.pending)
+            self.pending = None
+        if self.worker:
+            self.jobs.put(None)
+            self.worker = None
+
+    def poll(self):
+        try:
+            generation, low, new, next = self.results.get_nowait()
+        except queue.Empty:
+            self.text.after(self.frameDelay, self.poll)
+            return
+        self.busy = False
+        if not self.active:
+            return
+        if generation == self.generation:       # else edited meanwhile
+            self.lines.update(low, new, next)
+            self.schedule()
+        self.submit()
+
+    # tagging the view
+
+    def schedule(self):
+        if self.pending is None and self.active:
+            self.pending = self.text.after(self.frameDelay, self.retag)
+
+    def retag(self):
+        self.pending = None
+        if not self.active or self.editor.viewer:
+            return
+        document = self.editor.document
+        original = self.editor.redirector.original
+        first = int(str(original('index', '@0,0')).split('.')[0])
+        corner = '@0,%d' % self.text.winfo_height()
+        last = int(str(original('index', corner)).split('.')[0])
+        state = self.lines.stateAt(first - 1, document)
+        text = document.get(document.lineStart(first),
+                            document.lineStart(last + 1))
+        ranges = {kind: [] for kind in self.kinds}
+        for (i, line) in enumerate(text.split('\n')[:last - first + 1]):
+            tokens, state = scanLine(line, state)
+            for (start, end, kind) in tokens:
+                ranges[kind] += ['%d.%d' % (first + i, start),
+                                 '%d.%d' % (first + i, end)]
+        for kind in self.kinds:
+            tag = 'syn-' + kind
+            self.text.tag_remove(tag, '%d.0' % first, '%d.0 lineend' % last)
+            if ranges[kind]:
+                self.text.tag_add(tag, *ranges[kind])
+
+class LongLineGuard:
+    """
+    lines longer than longLineLimit are shown truncated: text past a
+    preview is elided, which Tk's line layout skips, while widget and
+    document indexes stay the same; double-click the orange mark at
+    the cut to show the whole line
+    """
+    def __init__(self, editor):
+        self.editor = editor
+        self.text = editor.text
+        self.limit = configs.get('longLineLimit', 20000)
+        self.preview = min(configs.get('longLinePreview', 2000), self.limit)
+        if self.limit:
+            self.pattern = re.compile('[^\n]{%d,}' % self.limit)
+        self.text.tag_config('longtail', elide=True)
+        self.text.tag_config('longcut',
+                             background=configs.get('longLineMark', 'orange'))
+        self.text.tag_bind('longcut', '<Double-1>', self.onExpand)
+        editor.editHooks.append(self.onEdit)
+
+    def onEdit(self, kind, offset, text):
+        if not self.limit:
+            return
+        document = self.editor.document
+        if kind == 'reset':
+            cut = self.guard(0, len(document))
+            if cut:
+                self.editor.setMessage(
+                    '%d long line%s shown truncated: double-click the mark '
+                    'to expand' % (cut, 's'[:cut > 1]))
+            return
+        first = document.position(offset)[0]
+        last = first + (text.count('\n') if kind == 'insert' else 0)
+        start = document.lineStart(first)
+        end = document.offset(last, len(document))      # clamped to eol
+        if end - start >= self.limit or self.text.tag_nextrange(
+                'longtail', self.editor.textIndex(start),
+                self.editor.textIndex(end)):
+            self.guard(start, end)
+
+    def guard(self, start, end):
+        """
+        retruncate long lines between document offsets start and end;
+        returns the number of lines cut
+        """
+        editor = self.editor
+        first, last = editor.textIndex(start), editor.textIndex(end)
+        self.text.tag_remove('longtail', first, last)
+        self.text.tag_remove('longcut', first, last)
+        cut = 0
+        for (base, match) in findAll(editor.document, self.pattern, None,
+                                     start, end):
+            begin = base + match.start()
+            if 'longopen' in self.text.tag_names(editor.textIndex(begin)):
+                continue                            # expanded by the user
+            middle = editor.textIndex(begin + self.preview)
+            self.text.tag_add('longcut', middle + '-1c', middle)
+            self.text.tag_add('longtail', middle,
+                              editor.textIndex(base + match.end()))
+            cut += 1
+        return cut
+
+    def expand(self, index):
+        """
+        show the whole line holding index, and keep it shown
+        """
+        first, last = index + ' linestart', index + ' lineend'
+        self.text.tag_remove('longtail', first, last)
+        self.text.tag_remove('longcut', first, last)
+        self.text.tag_add('longopen', first, last)
+
+    def onExpand(self, event):
+        self.expand(self.text.index('@%d,%d' % (event.x, event.y)))
+
+    def expandAll(self):
+        self.text.tag_remove('longtail', '1.0', END)
+        self.text.tag_remove('longcut', '1.0', END)
+        self.text.tag_add('longopen', '1.0', END)
+
 class TextEditor:
     startfiledir = '.'
     editwindows = []
@@ -54,7 +1237,7 @@ class TextEditor:
 
     else:
         from p_python.TextEditor.textConfig import (
-            openEncoding, openEncoding, savesUseKnownEncoding,
+            openAskUser, openEncoding, savesUseKnownEncoding,
             savesEncoding, savesAskUser)
 
     ftypes = [('All files', '*'),
@@ -83,14 +1266,31 @@ class TextEditor:
     def __init__(self, loadFirst='', loadEncode=''):
         if not isinstance(self, GuiMaker):
             raise TypeError('TextEditor needs a GuiMaker mixin')
-        self.setFileName(None)
-        #self.currfile = None
         self.lastFind = None
+        self.search = None
+        self.searchKey = None
+        self.searchNocase = configs.get('caseinsens', True)
+        self.searchRegex = configs.get('searchRegex', False)
         self.openDialog = None
         self.saveDialog = None
         self.knownEncoding = None
+        self.loader = None
+        self.inserter = None
+        self.viewer = None
+        self.saver = None
+        self.saveAgain = False
+        self.saveState = ''
+        self.setFileName(None)              # titles need the save state
+        #self.currfile = None
         self.text.focus()
 
+        self.autosavePending = None
+        autosave = configs.get('autosaveInterval', 0)
+        if autosave:
+            self.autosavePending = self.after(int(autosave * 1000),
+                                              self.onAutosave)
+            self.bind('<Destroy>', self.stopAutosave, add='+')
+
         if loadFirst:
             self.update()
             self.onOpen(loadFirst, loadEncode)
@@ -100,7 +1300,10 @@ class TextEditor:
             ('File', 0,
                 [('New                                Ctrl+N', 0, self.onNew),
                  ('New Window      Ctrl+Shift+N', 1, self.onClone),
+                 ('New Window Process', 11, self.onCloneProcess),
                  ('Open...                           Ctrl+O', 0, self.onOpen),
+                 ('Open Read-Only View...', 5, self.onView),
+                 ('Compare with...', 2, self.onCompare),
                  ('Save                                Ctrl+S', 0, self.onSave),
                  ('Save As...               Ctrl+Shif+S', 5, self.onSaveAs),
                  'separator',
@@ -110,6 +1313,7 @@ class TextEditor:
                  ]),
             ('Edit', 0,
                 [('Undo                         Ctrl+Z', 0, self.onUndo),
+                 ('Redo                          Ctrl+Y', 0, self.onRedo),
                  'separator',
                  ('Cut                            Ctrl+X', 0, self.onCut),
                  ('Copy                         Ctrl+C', 0, self.onCopy),
@@ -118,16 +1322,18 @@ class TextEditor:
                  'separator',
                  ('Search with Bing...  Ctrl+E', 1, self.notDone),
                  ('Find...                        Ctrl+F', 0, self.onFind),
-                 ('Find Next                        F3', 1, self.notDone),
-                 ('Find Previous        Shift+F3', 1, self.notDone),
+                 ('Find Next                        F3', 1, self.onFindNext),
+                 ('Find Previous        Shift+F3', 1, self.onFindPrev),
                  ('Replace...                 Ctrl+H', 0, self.onReplace),
+                 ('Find in Files...  Ctrl+Shift+F', 5, self.onFindInFiles),
                  ('Go To...                     Ctrl+G', 0, self.onGoto),
                  'separator',
                  ('Select All                   Ctrl+A', 0, self.onSelectAll),
                  ('Time/Date                        F5', 0, self.onTime)
                  ]),
             ('Format', 0,
-                [('Word wrap            ', 0, self.notDone),
+                [('Word wrap            ', 0, self.onWordWrap),
+                 ('Expand Long Lines', 0, self.onExpandLongLines),
                  ('Font...', 0, self.onFont),
                  ('Pick Bg...', 0, self.onBg),
                  ('Pick Fg...', 0, self.onFg)
@@ -137,7 +1343,9 @@ class TextEditor:
                     [('Zoom In                          Ctrl+Plus', 1, self.notDone),
                      ('Zoom Out                   Ctrl+Minus', 1, self.notDone),
                      ('Restore Default Zoom       Ctrl+0', 1, self.notDone)]),
-                 ('Status Bar', 0, self.notDone)
+                 ('Status Bar', 0, self.onStatusBar),
+                 ('Line Numbers', 0, self.onLineNumbers),
+                 ('Command Latency...', 0, self.onCommandLatency)
                  ]),
             ('Help', 0,
                 [('View Help', 0, self.notDone),
@@ -150,14 +1358,15 @@ class TextEditor:
         vbar = Scrollbar(self)
         hbar = Scrollbar(self, orient='horizontal')
         text = Text(self, padx=5, wrap='none')
-        text.config(undo=1, autoseparators=1)
+        text.config(undo=0)                 # see self.history
 
         vbar.pack(side=RIGHT, fill=Y)
         hbar.pack(side=BOTTOM, fill=X)
 
         text.pack(side=TOP, fill=BOTH, expand=YES)
+        self.message = Label(self, anchor=W, relief=SUNKEN, bd=1)
 
-        text.config(yscrollcommand = vbar.set)
+        text.config(yscrollcommand = self.onTextScroll)
         text.config(xscrollcommand = hbar.set)
 
         vbar.config(command = text.yview)
@@ -174,12 +1383,191 @@ class TextEditor:
             text.config(width=configs['width'])
 
         self.text = text
+        self.vbar = vbar
+        self.hbar = hbar
+
+        # mirror every widget edit into a headless document model
+        self.document = PieceTable()
+        self.changes = 0
+        self.editHooks = []
+        self.redirector = WidgetRedirector(text)
+        self.redirector.register('insert', self.onTextInsert)
+        self.redirector.register('delete', self.onTextDelete)
+        self.redirector.register('replace', self.onTextReplace)
+        self.redirector.register('edit', self.onTextEdit)
+
+        # edits are journaled for recovery after a crash
+        self.journal = journal.Journal(self.document,
+                                       lambda: (self.currfile, self.knownEncoding),
+                                       configs.get('journalDir'),
+                                       configs.get('journalCompactAbove'),
+                                       configs.get('journal', True))
+        self.editHooks.append(self.journal.onEdit)
+
+        # undo history kept here, within a memory budget
+        self.history = UndoHistory(configs.get('undoBudget', 32 * 1024 * 1024),
+                                   configs.get('undoPackAbove', 4096))
+        self.editHooks.append(self.history.onEdit)
+
+        # live highlight-all of search matches in and near the view
+        text.tag_config('found', background=configs.get('highlightBg',
+                                                        'yellow'))
+        text.tag_lower('found')
+        self.highlightKey = None
+        self.highlighted = None             # (low, high) offsets tagged
+        self.highlightPending = None
+        self.editHooks.append(self.onHighlightEdit)
+
+        for (key, command) in (('<Control-s>', self.onSave),
+                               ('<Control-p>', self.onPrint),
+                               ('<Control-f>', self.onFind),
+                               ('<F3>', self.onFindNext),
+                               ('<Shift-F3>', self.onFindPrev),
+                               ('<Control-g>', self.onGoto),
+                               ('<Control-h>', self.onReplace),
+                               ('<Control-F>', self.onFindInFiles),
+                               ('<Control-N>', self.onClone),
+                               ('<Control-y>', self.onRedo)):
+            self.text.bind(key, self.wrapCommand(key, command))
+        self.text.bind('<<Modified>>', self.onModified)
+
+        self.statusBar = StatusBar(self)
+        if configs.get('statusBar', True):
+            self.statusBar.show()
+        self.gutter = LineNumbers(self)
+        if configs.get('lineNumbers', False):
+            self.gutter.show()
+        self.syntax = SyntaxHighlighter(self)
+        self.bind('<Destroy>', self.syntax.stop, add='+')
+        self.longLines = LongLineGuard(self)
+        if configs.get('wordWrap', False):
+            text.config(wrap='word')
+
+    # document model: Text widget operations, mirrored
+
+    def textOffset(self, index):
+        """
+        document offset of a Tk text index; like Tk, indexes past the
+        end are clamped to before the widget's final newline
+        """
+        where = str(self.redirector.original('index', index))
+        line, col = map(int, where.split('.'))
+        return self.document.offset(line, col)
 
-        self.text.bind('<Control-s>', self.onSave)
-        self.text.bind('<Control-p>', self.onPrint)
-        self.text.bind('<Control-f>', self.onFind)
-        self.text.bind('<Control-g>', self.onGoto)
-        self.text.bind('<Control-h>', self.onReplace)
+    def textIndex(self, offset):
+        return '%d.%d' % self.document.position(offset)
+
+    def textEditable(self):
+        return str(self.redirector.original('cget', '-state')) != DISABLED
+
+    def notifyEdit(self, kind, offset, text):
+        """
+        tell edit hooks about an 'insert' or 'delete' of text at offset,
+        or a 'reset' when the whole document was replaced
+        """
+        self.changes += 1
+        for hook in self.editHooks:
+            hook(kind, offset, text)
+
+    def onTextInsert(self, index, chars, *args):
+        if not self.textEditable() or self.inserterBusy():
+            return
+        if (not args and not self.inserter and not self.history.applying and
+                len(chars) > configs.get('insertChunkAbove', 1024 * 1024)):
+            self.inserter = ChunkedInserter(self, index, chars)
+            return
+        offset = self.textOffset(index)
+        self.redirector.original('insert', index, chars, *args)
+        chars += ''.join(args[1::2])                # chars, tags, chars...
+        self.document.insert(offset, chars)
+        self.notifyEdit('insert', offset, chars)
+
+    def onTextDelete(self, index1, index2=None, *more):
+        if not self.textEditable() or self.inserterBusy():
+            return
+        if more:
+            # several ranges: delete one at a time, last first
+            indexes = [index1, index2] + list(more)
+            ranges = [(self.textOffset(first), str(self.text.index(first)),
+                       last and str(self.text.index(last)))
+                      for (first, last) in zip(indexes[::2],
+                                               indexes[1::2] + [None])]
+            for (offset, first, last) in sorted(ranges, reverse=True):
+                self.onTextDelete(first, last)
+            return
+        start = self.textOffset(index1)
+        if index2 is None:
+            end = start + 1
+            self.redirector.original('delete', index1)
+        else:
+            end = self.textOffset(index2)
+            self.redirector.original('delete', index1, index2)
+        deleted = self.document.delete(start, end - start)
+        if deleted:
+            self.notifyEdit('delete', start, deleted)
+
+    def inserterBusy(self):
+        """
+        true while a chunked insert is running, except for its own edits;
+        the edit asked for is refused, so say so
+        """
+        if self.inserter is None or self.inserter.busy:
+            return False
+        self.bell()
+        self.setMessage(ChunkedInserter.busyMessage)
+        return True
+
+    def whenInserted(self, action):
+        """
+        run action after any chunked insert in progress, else now
+        """
+        if self.inserter:
+            self.inserter.then.append(action)
+        else:
+            action()
+
+    def onTextReplace(self, index1, index2, *args):
+        first = str(self.text.index(index1))
+        last = str(self.text.index(index2))
+        self.onTextDelete(first, last)
+        self.onTextInsert(first, *args)
+
+    def onTextEdit(self, command, *args):
+        # Tk's undo is off: its edit commands, from bindings like
+        # <<Undo>> as well as our code, go to the Python-side history
+        if command == 'undo':
+            self.onUndo()
+        elif command == 'redo':
+            self.onRedo()
+        elif command == 'separator':
+            self.history.separate()
+        elif command == 'reset':
+            self.history.reset()
+        else:
+            if command == 'modified' and args and not self.tk.getboolean(args[0]):
+                self.history.markClean()
+            return self.redirector.original('edit', command, *args)
+        return ''
+
+    def wrapCommand(self, label, command):
+        """
+        with command timing on, time each call until the next idle,
+        so the redraw it causes is counted too
+        """
+        timer = commandTimer
+        if timer is None:
+            return command
+        name = ' '.join(label.split())
+        def timed(*args):
+            entry = timer.begin(name)
+            try:
+                return command(*args)
+            finally:
+                try:
+                    self.after_idle(timer.end, entry)
+                except TclError:                # command closed us
+                    timer.end(entry)
+        return timed
 
     # File menu commands
     '''def my_askopenfilename(self):
@@ -194,90 +1582,191 @@ class TextEditor:
                                      filetypes=self.ftypes)
             return self.saveDialog.show()
     
-    def onOpen(self, loadFirst='', loadEncode=''):
+    def onOpen(self, loadFirst='', loadEncode='', then=None):
         """
-        Open file from system
+        Open file from system; the file is mapped once, then decoded
+        and inserted in chunks from after() callbacks, so the GUI stays
+        live and the load can be cancelled; then() runs once it is in
         """
-        def Open():
-            global file
-            file = loadFirst or askopenfilename(initialdir=self.startfiledir,
-                                    filetypes=self.ftypes)
-            if not file:
-                return
-            if not os.path.isfile(file):
-                showerror('PyNote', 'Could not open file'+file)
-                return
-
+        self.finishSave()
         if self.text.edit_modified():
-            if not askyesno('PyNote', 'Save changes to file?'):
-                Open()
-            else:
+            if askyesno('PyNote', 'Save changes to file?'):
                 self.onSave()
-                self.text.edit_modified(0)
-        
-        if not self.text.edit_modified():
-            Open()
-        
+                self.finishSave()
+
+        file = loadFirst or askopenfilename(initialdir=self.startfiledir,
+                                            filetypes=self.ftypes)
+        if not file:
+            return
+        if not os.path.isfile(file):
+            showerror('PyNote', 'Could not open file ' + file)
+            return
+        if os.path.getsize(file) > configs.get('viewThreshold', 512 * 1024**2):
+            if askyesno('PyNote', 'File is very large: open it in the '
+                                  'read-only viewer instead?'):
+                self.onView(file)
+                return
+        self.closeViewer()
+        try:
+            data = openBytes(file)
+        except (IOError, ValueError):
+            showerror('PyNote', 'Could not open file ' + file)
+            return
+
+        self.onCancelLoad()
+        self.loader = ChunkedLoader(self, file, data,
+                                    self.openEncodings(data, loadEncode), then)
+        self.loader.start()
+
+    def openEncodings(self, data, loadEncode=''):
+        """
+        generator: encodings to try for an open, in order; guesses come
+        from sniffing a sample of the file's bytes, and the loader's
+        decode falls back to the next one if a guess fails; the user is
+        asked only when an unsure best guess does; None means raw bytes
+        """
+        tried = set()
+        def untried(encoding):
+            if encoding in tried:
+                return False
+            tried.add(encoding)
+            return True
+
         # try known encoding if passed and acurate
-        text = None
         if loadEncode:
-            try:
-                text = open(file, 'r', encoding=loadEncode).read()
-                self.knownEncoding = loadEncode
-            except (UnicodeError, LookupError, IOError):
-                pass
-
-        # try user input, prefill with next choice as default
-        if text == None and self.openAskUser:
+            tried.add(loadEncode)
+            yield loadEncode
+
+        guesses = []
+        if configs.get('openDetect', True):
+            guesses = detectEncoding(data, self.openEncoding)
+        confident = (guesses and
+                     guesses[0][1] >= configs.get('openAskConfidence', 0.9))
+
+        # an unsure best guess is still tried first: the loader's full
+        # decode checks it, and the user is asked only if that fails
+        if guesses and not confident and untried(guesses[0][0]):
+            yield guesses[0][0]
+
+        # try user input, prefill with next guess or next choice
+        if self.openAskUser and not confident:
             self.update()
             askuser = askstring('PyNote', 'Enter Unicode encoding for open',
-                                initialvalue=(self.openEncoding or 
+                                initialvalue=(guesses[1:] and guesses[1][0] or
+                                self.openEncoding or
                                 sys.getdefaultencoding() or ''))
+            if askuser and untried(askuser):
+                yield askuser
+
+        # try guesses, config file, then platform default
+        for (encoding, confidence) in guesses:
+            if untried(encoding):
+                yield encoding
+        if self.openEncoding and untried(self.openEncoding):
+            yield self.openEncoding
+        if untried(sys.getdefaultencoding()):
+            yield sys.getdefaultencoding()
+
+        # last resort: use binary bytes, one char per byte
+        yield None
+
+    def onView(self, loadFirst=''):
+        """
+        open a file in the read-only, memory-mapped viewer; only the
+        visible lines are ever put in the Text widget
+        """
+        self.finishSave()
+        if self.text.edit_modified():
+            if askyesno('PyNote', 'Save changes to file?'):
+                self.onSave()
+                self.finishSave()
+        file = loadFirst or askopenfilename(initialdir=self.startfiledir,
+                                            filetypes=self.ftypes)
+        if not file:
+            return
+        try:
+            lines = MappedLines(file)
+        except (IOError, ValueError):
+            showerror('PyNote', 'Could not open file ' + file)
+            return
 
-            if askuser:
-                try:
-                    text = open(file, 'r', encoding=askuser).read()
-                    self.knownEncoding = askuser
-                except (UnicodeError, LookupError, IOError):
-                    pass
-        
-        #try config file
-        if text == None and self.openEncoding:
-            try:
-                text = open(file, 'r', encoding=self.openEncoding).read()
-                self.knownEncoding = self.openEncoding
-            except (UnicodeError, LookupError, IOError):
-                pass
+        # lines are split on newline bytes: needs an ASCII superset
+        guesses = detectEncoding(lines.data, self.openEncoding)
+        encoding = guesses[0][0] if guesses else 'latin-1'
+        if '\n'.encode(encoding) != b'\n':
+            lines.close()
+            showerror('PyNote', 'Viewer cannot show %s files' % encoding)
+            return
 
-        #try platform default
-        if text == None:
-            try:
-                text = open(file, 'r', encoding=sys.getdefaultencoding()).read()
-                self.knownEncoding = sys.getdefaultencoding()
-            except (UnicodeError, LookupError, IOError):
-                pass
+        self.onCancelLoad()
+        self.closeViewer()
+        self.clearAllText()
+        self.text.edit_reset()
+        self.text.edit_modified(0)
+        self.journal.clean()
+        self.viewer = MappedViewer(self, lines, encoding)
+        self.setFileName(file)
+        self.knownEncoding = encoding
+        self.statusBar.schedule()
+        self.gutter.schedule()
+
+    def closeViewer(self):
+        if self.viewer:
+            self.viewer.close()
+            self.viewer = None
+            self.statusBar.schedule()
+            self.gutter.schedule()
+
+    def isViewing(self):
+        if self.viewer:
+            showerror('PyNote', 'Not available in the read-only viewer')
+        return self.viewer is not None
+
+    def onCompare(self):
+        """
+        compare this window's text with a file, side by side
+        """
+        if self.isViewing():
+            return
+        file = askopenfilename(initialdir=self.startfiledir,
+                               filetypes=self.ftypes)
+        if file:
+            CompareView(self, file)
 
-        # last resort: use binary bytes and rely on Tk to decode
-        if text == None:
+    def onRecover(self):
+        """
+        offer to restore text left unsaved by a PyNote that crashed,
+        replayed from its journal, each in a new window
+        """
+        for path in journal.recoverable(configs.get('journalDir')):
             try:
-                text = open(file, 'rb').read()
-                text.replace(b'\r\n', b'\n')
-                self.knownEncoding = None
-            except IOError:
-                pass
-        
-        if text == None:
-            showerror('PyNote', 'Could not decode and open file' + file)
-        else:
-            self.setAllText(text)
-            self.setFileName(file)
-            self.text.edit_reset()
-            self.text.edit_modified(0)
-
-    def onSave(self, event):
+                header, text = journal.recover(path)
+            except (OSError, ValueError) as why:
+                showerror('PyNote', 'Cannot recover %s: %s' % (path, why))
+            else:
+                name = header['file'] or 'an untitled file'
+                if askyesno('PyNote', 'Recover unsaved changes to %s?' % name):
+                    window = TextEditorMainPopup(self.winfo_toplevel())
+                    window.setFileName(header['file'] or None)
+                    window.knownEncoding = header['encoding'] or None
+                    window.text.insert('1.0', text)     # journaled anew
+            journal.removeSession(path)
+
+    def onCancelLoad(self):
+        if self.loader:
+            self.loader.cancel()
+        if self.inserter:
+            self.inserter.cancel()
+
+    def onSave(self, event=None):
         """
         save file to system
         """
+        if self.isViewing():
+            return
+        if self.saver:
+            self.saveAgain = True               # once this one is done
+            return
         filename = self.currfile or self.my_asksaveasfilename()
         #print(filename)
 
@@ -285,151 +1774,111 @@ class TextEditor:
             filename = asksaveasfilename(initialdir=self.startfiledir,
                                      filetypes=self.ftypes)
             #print(str(filename)+'1')
-        
-        text = self.getAllText()
-        enpick = None
-
         if filename:
-            # try known encoding at latest Open or Save, if any
-            if self.knownEncoding and ((self.currfile and self.savesUseKnownEncoding >=1) or 
-                                        (not self.currfile and self.savesUseKnownEncoding >=2)):
-
-                try:
-                    text.encode(self.knownEncoding)
-                    enpick = self.knownEncoding
-                except UnicodeError:
-                    pass
-
-            #try user input, prefill with known type, else next choice
-            if not enpick and self.savesAskUser:
-                self.update()
-                askuser = askstring('PyNote', 'Enter unicode encoding for save',
-                                    initialvalue = (self.knownEncoding or
-                                                    self.savesEncoding or
-                                                    sys.getdefaultencoding() or ''))
-                if askuser:
-                    try:
-                        text.encode(askuser)
-                        enpick = askuser
-                    except (UnicodeError, LookupError):
-                        pass
-
-            #try config file
-            if not enpick and self.savesEncoding:
-                try:
-                    text.encode(self.savesEncoding)
-                    enpick = self.savesEncoding
-                except (UnicodeError, LookupError):
-                    pass
-
-            #try platform default
-            if not enpick:
-                try:
-                    text.encode(sys.getdefaultencoding())
-                    enpick = sys.getdefaultencoding
-                except (UnicodeError, LookupError):
-                    pass
-
-            # open in text mode for endlines + encoding
-            if not enpick:
-                showerror('PyNote', 'Could not encode for file'+filename)
-
-            else:
-                try:
-                    file = open(filename, 'w', encoding=enpick)
-                    file.write(text)
-                    file.close()
-                except:
-                    showerror('PyNote', 'Could not save file'+filename)
-                else:
-                    self.setFileName(filename)
-                    self.text.edit_modified(0)
-                    self.knownEncoding = enpick
+            useKnown = self.savesUseKnownEncoding >= (1 if self.currfile else 2)
+            self.saveFile(filename, useKnown)
 
     def onSaveAs(self):
         """
         save file to system
         """
-        filename = asksaveasfilename()
-
-        if not filename:
+        if self.isViewing():
             return
-        
-        text = self.getAllText()
-        enpick = None
+        self.finishSave()
+        filename = asksaveasfilename()
+        if filename:
+            self.saveFile(filename, self.savesUseKnownEncoding >= 1)
 
+    def saveEncodings(self, useKnown, ask=True):
+        """
+        generator: encodings to try for a save, in order; the user is
+        only asked if the known encoding fails
+        """
         # try known encoding at latest Open or Save, if any
-        if self.knownEncoding and ((self.savesUseKnownEncoding >=1) or 
-                                    ( self.savesUseKnownEncoding >=2)):
-
-            try:
-                text.encode(self.knownEncoding)
-                enpick = self.knownEncoding
-            except UnicodeError:
-                pass
+        if self.knownEncoding and useKnown:
+            yield self.knownEncoding
 
         #try user input, prefill with known type, else next choice
-        if not enpick and self.savesAskUser:
+        if self.savesAskUser and ask:
             self.update()
             askuser = askstring('PyNote', 'Enter unicode encoding for save',
                                 initialvalue = (self.knownEncoding or
                                                 self.savesEncoding or
                                                 sys.getdefaultencoding() or ''))
             if askuser:
-                try:
-                    text.encode(askuser)
-                    enpick = askuser
-                except (UnicodeError, LookupError):
-                    pass
+                yield askuser
 
-        #try config file
-        if not enpick and self.savesEncoding:
-            try:
-                text.encode(self.savesEncoding)
-                enpick = self.savesEncoding
-            except (UnicodeError, LookupError):
-                pass
+        #try config file, then platform default
+        if self.savesEncoding:
+            yield self.savesEncoding
+        yield sys.getdefaultencoding()
 
-        #try platform default
-        if not enpick:
-            try:
-                text.encode(sys.getdefaultencoding())
-                enpick = sys.getdefaultencoding
-            except (UnicodeError, LookupError):
-                pass
+    def saveFile(self, filename, useKnown):
+        """
+        save a snapshot of the document to filename in the background;
+        the buffer is only marked unchanged once the write is done
+        """
+        self.saver = BackgroundSave(self, filename,
+                                    self.saveEncodings(useKnown))
+        self.saver.start()
+
+    def onAutosave(self):
+        """
+        periodic save to the current file: known encoding, no dialogs
+        """
+        self.autosavePending = self.after(
+                int(configs.get('autosaveInterval') * 1000), self.onAutosave)
+        if (self.currfile and self.text.edit_modified() and
+                not (self.saver or self.loader or self.viewer)):
+            self.saver = BackgroundSave(self, self.currfile,
+                                        self.saveEncodings(True, ask=False),
+                                        quiet=True)
+            self.saver.start()
+
+    def stopAutosave(self, event=None):
+        """
+        the editor is being destroyed: no more autosaves for it
+        """
+        if self.autosavePending:
+            self.after_cancel(self.autosavePending)
+            self.autosavePending = None
 
-        # open in text mode for endlines + encoding
-        if not enpick:
-            showerror('PyNote', 'Could not encode for file'+filename)
+    def finishSave(self):
+        if self.saver:
+            self.saver.wait()
 
-        else:
-            try:
-                file = open(filename, 'w', encoding=enpick)
-                file.write(text)
-                file.close()
-            except:
-                showerror('PyNote', 'Could not save file'+filename)
-            else:
-                self.setFileName(filename)
-                self.text.edit_modified(0)
-                self.knownEncoding = enpick
+    def setSaveState(self, state):
+        self.saveState = state
+        self.title()
 
     def onNew(self):
         """
         start editing a new file from scratch in current window;
         """
+        self.finishSave()
         if self.text.edit_modified():
             if not askyesno('PyNote', 'Discard changes made to file?'):
                 return
+        self.onCancelLoad()
+        self.closeViewer()
         self.setFileName(None)
         self.clearAllText()
         self.text.edit_reset()
         self.text.edit_modified(0)
         self.knownEncoding = None
+        self.journal.clean()
 
-    def onClone(self):
+    def onClone(self, event=None):
         """
-        open a new edit window
+        open a new edit window in this process: it shares the Tk
+        interpreter, fonts, icon and caches, so it opens at once
+        """
+        TextEditorMainPopup(self.winfo_toplevel())
+
+    def onCloneProcess(self):
+        """
+        open a new edit window in a process of its own, isolated
+        from this one at the cost of a full startup
         """
         from p_python.launchmodes import PortableLauncher
         PortableLauncher('PyNote', 'PyNote.py')()
@@ -474,21 +1923,77 @@ class TextEditor:
 
         Print(options, master)
 
+    # Format menu commands
+
+    def onWordWrap(self):
+        wrap = 'word' if str(self.text.cget('wrap')) == 'none' else 'none'
+        self.text.config(wrap=wrap)
+        self.gutter.schedule()
+
+    def onExpandLongLines(self):
+        self.longLines.expandAll()
+
+    # View menu commands
+
+    def onStatusBar(self):
+        self.statusBar.show(not self.statusBar.visible())
+
+    def onLineNumbers(self):
+        self.gutter.show(not self.gutter.visible())
+
+    def onCommandLatency(self):
+        """
+        show the command timing statistics gathered so far
+        """
+        if commandTimer is None:
+            showinfo('PyNote', 'Command timing is off: set commandTiming '
+                               'in textConfig, or run with --time-commands')
+            return
+        new = Toplevel(self)
+        new.title('PyNote-Command Latency')
+        report = Text(new, font=('courier', 10), wrap='none',
+                      height=24, width=90)
+        report.pack(expand=YES, fill=BOTH)
+        report.insert('1.0', '\n'.join(commandTimer.report()))
+        report.config(state=DISABLED)
+
     # Edit menu commands
-    def onUndo(self):
-        try:
-            self.text.edit_undo()
-        except TclError:
-            pass
+    def onUndo(self, event=None):
+        self.replayHistory(self.history.undo)
+        return 'break'
 
-    def onRedo(self):
-        try:
-            self.text.edit_redo()
-        except TclError:
-            pass
+    def onRedo(self, event=None):
+        self.replayHistory(self.history.redo)
+        return 'break'
+
+    def replayHistory(self, replay):
+        """
+        undo or redo a step through the widget, so every edit hook
+        sees its edits; the text is clean again at its saved state
+        """
+        if self.loader or self.viewer or not self.textEditable():
+            return
+        where = replay(self.document.get,
+                       lambda offset, text: self.text.insert(
+                                                self.textIndex(offset), text),
+                       lambda offset, length: self.text.delete(
+                                                self.textIndex(offset),
+                                                self.textIndex(offset + length)))
+        if where is not None:
+            self.text.tag_remove(SEL, '1.0', END)
+            self.text.mark_set(INSERT, self.textIndex(where))
+            self.text.see(INSERT)
+            self.text.edit_modified(not self.history.atClean())
     
     def onCopy(self):
-        if not self.text.tag_ranges(SEL):
+        if self.viewer:
+            text = self.viewer.selectedText()
+            if text is None:
+                showerror('PyNote', 'Selection too large to copy')
+            elif text:
+                self.clipboard_clear()
+                self.clipboard_append(text)
+        elif not self.text.tag_ranges(SEL):
             pass
         else:
             text = self.text.get(SEL_FIRST, SEL_LAST)
@@ -509,28 +2014,45 @@ class TextEditor:
             self.onDelete()
 
     def onPaste(self):
+        """
+        insert the clipboard and select it; large pastes are inserted
+        in chunks, with progress and Cancel
+        """
         try:
             text = self.selection_get(selection='CLIPBOARD')
-        except:
-            pass
-        self.text.insert(INSERT, text)
+        except TclError:
+            showerror('PyNote', 'Nothing to paste')
+            return
+        if self.inserter or self.viewer:
+            return
+        start = self.textOffset(INSERT)
         self.text.tag_remove(SEL, '1.0', END)
-        self.text.tag_add(SEL, INSERT+'%dc' %len(text), INSERT)
-        self.text.see(INSERT)
+        self.text.insert(INSERT, text)
+        def select():
+            self.text.tag_add(SEL, self.textIndex(start),
+                              self.textIndex(start + len(text)))
+            self.text.see(INSERT)
+        self.whenInserted(select)
 
     def onSelectAll(self):
+        if self.viewer:
+            self.viewer.selectAll()
+            return
         self.text.tag_add(SEL, '1.0', END+'-1c')
         self.text.mark_set(INSERT, '1.0')
         self.text.see(INSERT)
 
-    def onGoto(self, event, forceline=None):
+    def onGoto(self, event=None, forceline=None):
         """
         goes to a passes in line number
         """
         line = forceline or askinteger('PyNote', 'Enter line number')
         self.text.update()
         self.text.focus()
-        if line is not None:
+        if line is not None and self.viewer:
+            if not self.viewer.gotoLine(line):
+                showerror('PyNote', 'line number is beyond total numbers of lines')
+        elif line is not None:
             maxindex = self.text.index(END+'-1c')
             maxline = int(maxindex.split('.')[0])
             if line > 0 and line <= maxline:
@@ -542,25 +2064,141 @@ class TextEditor:
             else:
                 showerror('PyNote', 'line number is beyond total numbers of lines')
 
-    def onFind(self, event, lastkey=None):
+    def onFind(self, event=None, lastkey=None):
         """
-        Finds particular passed word in text
+        Finds particular passed word (or regex, in regex mode) in
+        text, from the cursor on
         """
-        key = lastkey or askstring('PyNote', 'Enter search string')
+        prompt = 'Enter search regex' if self.searchRegex else 'Enter search string'
+        key = lastkey or askstring('PyNote', prompt)
         self.text.update()
         self.text.focus()
         self.lastFind = key
-        if key:
-            nocase = configs.get('caseinsens', True)
-            where = self.text.search(key, INSERT, END, nocase=nocase)
-            if not where:
+        if key and self.viewer:
+            self.viewerFind(key)
+        elif key:
+            search = self.searchSession(key)
+            if search:
+                self.showMatch(search.following(self.textOffset(INSERT)))
+
+    def onFindNext(self, event=None):
+        """
+        next match of the last search, wrapping at the end
+        """
+        if not self.lastFind:
+            return self.onFind()
+        if self.viewer:
+            self.viewerFind(self.lastFind)
+            return 'break'
+        search = self.searchSession(self.lastFind)
+        if search:
+            self.showMatch(search.following(self.textOffset(INSERT)))
+        return 'break'
+
+    def onFindPrev(self, event=None):
+        """
+        previous match of the last search, wrapping at the start
+        """
+        if not self.lastFind:
+            return self.onFind()
+        if self.viewer:
+            self.viewerFind(self.lastFind, backwards=True)
+            return 'break'
+        search = self.searchSession(self.lastFind)
+        if search:
+            here = SEL_FIRST if self.text.tag_ranges(SEL) else INSERT
+            self.showMatch(search.preceding(self.textOffset(here)))
+        return 'break'
+
+    def viewerFind(self, key, backwards=False):
+        try:
+            found = self.viewer.find(key, self.searchNocase, backwards,
+                                     self.searchRegex)
+        except re.error as why:
+            showerror('PyNote', 'Bad pattern: %s' % why)
+        else:
+            if not found:
                 showerror('PyNote', 'word not found')
-            else:
-                #pastkey = 
-                #self.text.tag_remove(SEL, '1.0', END)       
-                self.text.see(where)
 
-    def onReplace(self, event):
+    def searchSession(self, key):
+        """
+        index of every match of key, kept up to date by edit hooks and
+        reused until the key or search modes change; compiled patterns
+        come from an LRU cache; None if key is a bad regex
+        """
+        mode = (key, self.searchNocase, self.searchRegex)
+        if self.search and self.searchKey == mode:
+            return self.search
+        try:
+            pattern, reach = searchPattern(*mode)
+        except re.error as why:
+            showerror('PyNote', 'Bad pattern: %s' % why)
+            return None
+        self.endSearch()
+        self.search = MatchIndex(self.document, pattern, reach)
+        self.searchKey = mode
+        self.editHooks.append(self.search.onEdit)
+        return self.search
+
+    def endSearch(self):
+        if self.search:
+            self.editHooks.remove(self.search.onEdit)
+            self.search = self.searchKey = None
+            self.statusBar.setSearch('')
+
+    def showMatch(self, index):
+        """
+        select match number index of the search session and scroll to it
+        """
+        if index is None:
+            self.statusBar.setSearch('')
+            showerror('PyNote', 'word not found')
+            return
+        start, end = self.search.match(index)
+        first, last = self.textIndex(start), self.textIndex(end)
+        self.text.tag_remove(SEL, '1.0', END)
+        if 'longtail' in self.text.tag_names(first):
+            self.longLines.expand(first)        # match is in a hidden tail
+        self.text.tag_add(SEL, first, last)
+        self.text.mark_set(INSERT, last)
+        self.text.see(first)
+        self.statusBar.setSearch('match %d of %d' % (index + 1,
+                                                      len(self.search)))
+
+    def onFindInFiles(self, event=None):
+        """
+        search every file under a folder in worker processes; hits
+        stream into a results pane, and clicking one opens it here
+        """
+        key = askstring('PyNote', 'Find in files' +
+                                  (' (regex)' if self.searchRegex else ''))
+        if not key:
+            return
+        root = askdirectory(initialdir=self.startfiledir)
+        if not root:
+            return
+        try:
+            search = FileSearch(root, key, self.searchNocase, self.searchRegex,
+                                self.openEncoding,
+                                configs.get('findMaxResults', 10000))
+        except re.error as why:
+            showerror('PyNote', 'Bad pattern: %s' % why)
+            return
+        FindResults(self, search, key)
+
+    def openAt(self, file, line, col=0):
+        """
+        show a line of a file, loading the file first if need be
+        """
+        def goto():
+            self.text.mark_set(INSERT, '%d.%d' % (line, col))
+            self.onGoto(forceline=line)
+        if self.currfile and os.path.abspath(self.currfile) == os.path.abspath(file):
+            goto()
+        else:
+            self.onOpen(file, then=goto)
+
+    def onReplace(self, event=None):
         """
         non-modal find/replace dialog
         """
@@ -574,24 +2212,182 @@ class TextEditor:
         entry2.grid(row=1, column=1, sticky=EW)
 
         def onFind():
-            self.onFind(entry1.get())
+            self.onFind(lastkey=entry1.get())
+
+        def onClose():
+            self.scheduleHighlight('')
+            new.destroy()
+
+        entry1.bind('<KeyRelease>',
+                    lambda event: self.scheduleHighlight(entry1.get()))
+        new.protocol('WM_DELETE_WINDOW', onClose)
 
         def onApply():
             self.onDoReplace(entry1.get(), entry2.get())
 
+        nocase = BooleanVar(new, value=self.searchNocase)
+        regex = BooleanVar(new, value=self.searchRegex)
+
+        def onMode():
+            self.searchNocase = nocase.get()
+            self.searchRegex = regex.get()
+            self.scheduleHighlight(entry1.get())
+
+        def onApplyAll():
+            self.onReplaceAll(entry1.get(), entry2.get())
+
         ttk.Button(new, text='Find', command=onFind).grid(row=0, column=2, sticky=EW)
         ttk.Button(new, text='Replace', command=onApply).grid(row=1, column=2, sticky=EW)
+        ttk.Button(new, text='Replace All', command=onApplyAll).grid(row=2, column=2, sticky=EW)
+        options = Frame(new)
+        options.grid(row=2, column=1, sticky=W)
+        Checkbutton(options, text='Ignore case', variable=nocase,
+                    command=onMode).pack(side=LEFT)
+        Checkbutton(options, text='Regex', variable=regex,
+                    command=onMode).pack(side=LEFT)
         new.columnconfigure(1, weight=1)
 
     def onDoReplace(self, findtext, replace):
-        # replace and find next
+        # replace and find next; regex mode expands group references
         if self.text.tag_ranges(SEL):
+            if self.searchRegex:
+                search = self.searchSession(findtext)
+                match = search and search.pattern.fullmatch(
+                                            self.text.get(SEL_FIRST, SEL_LAST))
+                if match:
+                    try:
+                        replace = match.expand(replace)
+                    except re.error as why:
+                        showerror('PyNote', 'Bad replacement: %s' % why)
+                        return
             self.text.delete(SEL_FIRST, SEL_LAST)
             self.text.insert(INSERT, replace)
             self.text.see(INSERT)
-            self.onFind(findtext)
+            self.onFind(lastkey=findtext)
             self.text.update()
 
+    def onReplaceAll(self, findtext, replace, nocase=None, regex=None):
+        """
+        replace every match in one pass over the document, applied to
+        the widget as a single undo step; literal or regex patterns
+        """
+        if not findtext or self.isViewing():
+            return
+        if nocase is None:
+            nocase = self.searchNocase
+        if regex is None:
+            regex = self.searchRegex
+        try:
+            pattern, reach = searchPattern(findtext, nocase, regex)
+            changes = list(replacements(self.document, pattern, replace,
+                                        expand=regex, reach=reach))
+        except re.error as why:
+            showerror('PyNote', 'Bad pattern: %s' % why)
+            return
+        if not changes:
+            showerror('PyNote', 'word not found')
+            return
+
+        # a few edits keep marks and tags in place; many are
+        # collapsed into one rewrite of the span they cover
+        self.history.beginGroup()
+        try:
+            if len(changes) <= configs.get('replaceBatchAbove', 64):
+                for (start, end, new) in reversed(changes):
+                    first = self.textIndex(start)
+                    self.text.delete(first, self.textIndex(end))
+                    self.text.insert(first, new)
+            else:
+                start, end = changes[0][0], changes[-1][1]
+                parts, pos = [], start
+                for (first, last, new) in changes:
+                    parts.append(self.document.get(pos, first))
+                    parts.append(new)
+                    pos = last
+                first = self.textIndex(start)
+                self.text.delete(first, self.textIndex(end))
+                self.text.insert(first, ''.join(parts))
+        finally:
+            self.history.endGroup()
+        self.text.see(INSERT)
+        showinfo('PyNote', '%d occurrences replaced' % len(changes))
+
+    # highlight-all: only the view and a margin around it are tagged
+
+    def scheduleHighlight(self, key):
+        """
+        debounce: retag after typing in the Find entry pauses
+        """
+        if self.highlightPending:
+            self.after_cancel(self.highlightPending)
+        self.highlightKey = key
+        self.highlightPending = self.after(configs.get('highlightDelay', 200),
+                                           self.refreshHighlight)
+
+    def refreshHighlight(self):
+        self.highlightPending = None
+        self.text.tag_remove('found', '1.0', END)
+        self.highlighted = None
+        self.extendHighlight()
+
+    def onHighlightEdit(self, kind, offset, text):
+        if self.highlightKey:
+            self.scheduleHighlight(self.highlightKey)
+
+    def onTextScroll(self, first, last):
+        self.vbar.set(first, last)
+        self.gutter.schedule()
+        self.syntax.schedule()
+        if self.highlightKey and not self.highlightPending:
+            self.highlightPending = self.after_idle(self.onScrollHighlight)
+
+    def onScrollHighlight(self):
+        self.highlightPending = None
+        self.extendHighlight()
+
+    def extendHighlight(self):
+        """
+        tag matches in the view plus a margin, scanning only the part
+        not already tagged; a far jump drops the old tags
+        """
+        if not self.highlightKey or self.viewer:
+            return
+        try:
+            pattern, reach = searchPattern(self.highlightKey,
+                                           self.searchNocase, self.searchRegex)
+        except re.error:
+            return
+        margin = configs.get('highlightMargin', 20000)
+        corner = '@%d,%d' % (self.text.winfo_width(), self.text.winfo_height())
+        low = max(self.textOffset('@0,0') - margin, 0)
+        high = min(self.textOffset(corner) + margin, len(self.document))
+
+        spans = [(low, high)]
+        if self.highlighted:
+            done, upto = self.highlighted
+            if low >= done and high <= upto:
+                return
+            if high < done or low > upto or max(high, upto) - min(low, done) > 8 * margin:
+                self.text.tag_remove('found', '1.0', END)
+            else:
+                spans = [(low, done), (upto, high)]
+                low, high = min(low, done), max(high, upto)
+        for (start, end) in spans:
+            if start < end:
+                self.tagMatches(pattern, reach, start, end)
+        self.highlighted = (low, high)
+
+    def tagMatches(self, pattern, reach, start, end):
+        ranges = []
+        for (base, match) in findAll(self.document, pattern, reach, start, end):
+            ranges.append(self.textIndex(base + match.start()))
+            ranges.append(self.textIndex(base + match.end()))
+            if len(ranges) >= 1000:
+                self.text.tag_add('found', *ranges)     # one call per batch
+                ranges = []
+        if ranges:
+            self.text.tag_add('found', *ranges)
+
     def onTime(self):
         try:
             import time
@@ -624,6 +2420,7 @@ class TextEditor:
             self.text.config(font=(family, int(size), style))
         except:
             showerror('PyNote', 'Font is not registered.')
+        self.gutter.schedule()
 
     def onFg(self):
         self.pickColour('fg')
@@ -637,12 +2434,15 @@ class TextEditor:
             self.text.config(**{part:hexstr})
 
     def isEmpty(self):
-        return not self.getAllText()
+        return self.document.isEmpty()
 
     def getAllText(self):
-        return self.text.get('1.0', END+'-1c')
+        return self.document.getText()
 
     def setAllText(self, text):
+        """
+        large texts go in chunks: see whenInserted
+        """
         self.text.delete('1.0', END)
         self.text.insert(END, text)
         self.text.mark_set(INSERT, '1.0')
@@ -656,8 +2456,39 @@ class TextEditor:
 
     def setFileName(self, name):
         self.currfile = name
+        self.title()
+        self.syntax.setFile(name)
         #self.filelabel.config
 
+    def title(self):
+        """
+        refresh the window title; called on the events that change it
+        (file name, modified flag, save state), never on a timer
+        """
+        pass                                # no window of our own here
+
+    def titleText(self):
+        if type(self.currfile) == str:
+            name = os.path.basename(self.currfile).split('.')[0]
+        else:
+            name = self.currfile
+        self.Title = name or 'Untitled'
+        modified = '*' if self.text.edit_modified() else ''
+        return modified + self.Title + ' - PyNote' + self.saveState
+
+    def onModified(self, event):
+        self.title()                        # flag set by an edit, or cleared
+        self.statusBar.schedule()           # a save may change the encoding
+
+    def setMessage(self, message):
+        """
+        show a line of feedback (such as truncated long lines) under
+        the text
+        """
+        if not self.message.winfo_manager():
+            self.message.pack(side=BOTTOM, fill=X, before=self.text)
+        self.message.config(text=message)
+
     def setKnownEncoding(self, encoding='utf-8'):
         self.knownEncoding = encoding
 
@@ -669,6 +2500,7 @@ class TextEditor:
 
     def setFont(self, font):
         self.text.config(font=font)
+        self.gutter.schedule()
 
     def setHeight(self, height):
         self.text.config(height=height)
@@ -701,15 +2533,30 @@ class TextEditorMain(TextEditor, GuiMakerWindowMenu):
         TextEditor.editwindows.append(self)
 
     def title(self):
-        if type(self.currfile) == str:
-            name = os.path.basename(self.currfile).split('.')[0]
-        else:
-            name = self.currfile
-        self.Title = name or 'Untitled' 
-        self.master.title(self.Title+' - PyNote')
-        self.after(1000, self.title)
+        self.master.title(self.titleText())
+
+    def endJournals(self):
+        for window in TextEditor.editwindows:
+            window.journal.end()
+        journal.flushJournals()
+
+    def serve(self, server):
+        """
+        open files sent by later PyNote runs, each in a new window; Tk
+        watches the socket, so an idle server costs nothing
+        """
+        def onRequest(file, mask):
+            for (name, encoding) in server.accept():
+                window = TextEditorMainPopup(self.winfo_toplevel(),
+                                             name, encoding)
+                window.popup.lift()
+                window.text.focus_force()
+        self.tk.createfilehandler(server.socket, READABLE, onRequest)
     
     def onQuit(self):
+        for window in TextEditor.editwindows:   # popups end with us
+            window.finishSave()
+        self.finishSave()
         close = not self.text.edit_modified()   # check for modification
         if not close:
             close = askyesno('PyNote', 'Discard changes made to file?')
@@ -717,12 +2564,14 @@ class TextEditorMain(TextEditor, GuiMakerWindowMenu):
             windows = TextEditor.editwindows
             changed = [w for w in windows if w != self and w.text.edit_modified()]
             if not changed:
+                self.endJournals()
                 GuiMaker.quit(self)
             else:
                 numchange = len(changed)
                 verify = '%s other edit windows%s changed: quit and discard anyhow?'
                 verify = verify %(numchange, 's' if numchange > 1 else '')
                 if askyesno('PyNote', verify):
+                    self.endJournals()
                     GuiMaker.quit(self)
 
 class TextEditorMainPopup(TextEditor, GuiMakerWindowMenu):
@@ -740,23 +2589,19 @@ class TextEditorMainPopup(TextEditor, GuiMakerWindowMenu):
         TextEditor.editwindows.append(self)
 
     def title(self):
-        if type(self.currfile) == str:
-            name = os.path.basename(self.currfile).split('.')[0]
-        else:
-            name = self.currfile
-        self.Title = name or 'Untitled' 
-        self.popup.title(self.Title+' - PyNote')
-        self.after(1000, self.title)
+        self.popup.title(self.titleText())
 
     def onQuit(self):
+        self.finishSave()
         close = not self.text.edit_modified()
         if not close:
             close = askyesno('PyNote', 'Text changed: quit and discard changes?')
         if close:
+            self.journal.end()
             self.popup.destroy()
             TextEditor.editwindows.remove(self)
-    
-    def onClone(self):
+
+    def onClone(self, event=None):
         TextEditor.onClone(self)
 
 class TextEditorComponent(TextEditor, GuiMakerFrameMenu):
@@ -765,10 +2610,12 @@ class TextEditorComponent(TextEditor, GuiMakerFrameMenu):
         TextEditor.__init__(self, loadFirst, loadEncode)
 
     def onQuit(self):
+        self.finishSave()
         close = not self.text.edit_modified()
         if not close:
             close = askyesno('PyNote', 'Text changed: quit and discard changes?')
         if close:
+            self.journal.end()
             self.destroy()
 
 # standalone program run
@@ -781,13 +2628,77 @@ class TextEditorComponent(TextEditor, GuiMakerFrameMenu):
     Button(root, text='Quit', command=root.quit).pack(fill=X)
     root.mainloop()'''
 
+def profileStartup(fname):
+    """
+    start as usual, timing imports, widget build, file load and first
+    paint, and print the breakdown to stderr once the window is drawn
+    """
+    marks = [('imports', time.perf_counter())]
+    editor = TextEditorMain()
+    editor.pack(expand=YES, fill=BOTH)
+    marks.append(('widgets', time.perf_counter()))
+
+    def loaded():
+        marks.append(('file load', time.perf_counter()))
+        editor.update_idletasks()
+        marks.append(('first paint', time.perf_counter()))
+        report = ['startup profile (ms):']
+        last = startTime
+        for (phase, when) in marks:
+            report.append('  %-12s %8.1f' % (phase, (when - last) * 1000))
+            last = when
+        report.append('  %-12s %8.1f' % ('total', (last - startTime) * 1000))
+        print('\n'.join(report), file=sys.stderr)
+
+    if fname:
+        editor.onOpen(fname, then=loaded)
+    else:
+        loaded()
+    return editor
+
 def main():
+    """
+    PyNote.py [--profile-startup] [--single-instance] [--time-commands]
+              [--encoding=name] [file...]
+    """
+    options = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    files = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    encoding = ''
+    for option in options:
+        if option.startswith('--encoding='):
+            encoding = option.split('=', 1)[1]
+
+    # hand the files to a running PyNote if there is one
+    server = None
+    if ((configs.get('singleInstance', False) or
+            '--single-instance' in options) and instance.supported()):
+        try:
+            path = instance.socketPath()
+            if instance.sendFiles(path, [(name, encoding) for name in files]):
+                return
+            server = instance.InstanceServer(path)
+        except OSError:
+            server = None                   # run on our own
+
+    if '--time-commands' in options:
+        timeCommands()
+    fname = files[0] if files else None
+    if '--profile-startup' in options:
+        editor = profileStartup(fname)
+    else:
+        editor = TextEditorMain(loadFirst=fname, loadEncode=encoding)
+        editor.pack(expand=YES, fill=BOTH)
+    for name in files[1:]:
+        TextEditorMainPopup(editor.winfo_toplevel(), name, encoding)
+    if server:
+        editor.serve(server)
+    if configs.get('journal', True):
+        editor.after_idle(editor.onRecover)
     try:
-        fname = sys.argv[1]
-    except IndexError:
-        fname = None
-    TextEditorMain(loadFirst=fname).pack(expand=YES, fill=BOTH)
-    mainloop()
+        mainloop()
+    finally:
+        if server:
+            server.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
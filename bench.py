@@ -0,0 +1,507 @@
+"""
+Benchmarks for PyNote's hot paths: open, save, find, replace, goto and
+whole-text inserts, at file sizes from 1K up.
+
+The document model and file helpers are timed directly, with no
+tkinter.  With --gui the same operations are also timed through a
+TextEditorComponent, from the call until the editor is idle again; if
+there is no display, one is started with Xvfb.  Results go to a JSON
+file, and a run given an earlier run's JSON by --baseline fails if
+anything is slower than it was by more than --tolerance.
+
+    python bench.py --sizes 1K,1M,64M,1G --gui --output new.json
+    python bench.py --baseline new.json --output next.json
+"""
+import argparse, json, os, platform, random, shutil, subprocess, sys
+import tempfile, time
+
+if __package__:
+    from p_python.TextEditor.textio import (openBytes, closeBytes,
+                                            decodeChunks, detectEncoding,
+                                            saveChunks)
+    from p_python.TextEditor.piecetable import PieceTable
+    from p_python.TextEditor.bigfile import MappedLines
+    from p_python.TextEditor.matchindex import (MatchIndex, replacements,
+                                                searchPattern)
+    from p_python.TextEditor.syntax import scanLine
+    from p_python.TextEditor.diff import diffTexts
+else:
+    from textio import (openBytes, closeBytes, decodeChunks, detectEncoding,
+                        saveChunks)
+    from piecetable import PieceTable
+    from bigfile import MappedLines
+    from matchindex import MatchIndex, replacements, searchPattern
+    from syntax import scanLine
+    from diff import diffTexts
+
+encodings = ('utf-8', 'latin-1', 'cp1252', 'utf-16')
+findKey, replaceWith = 'value', 'VALUE'
+lineFormat = '%9d    def f%d(value, café=%d): return value * 2\n'
+blockSize = 1024 * 1024
+
+def parseSize(text):
+    """
+    '1K', '64M', '1G' or plain bytes
+    """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def sizeName(size):
+    for (unit, scale) in (('G', 1024 ** 3), ('M', 1024 ** 2), ('K', 1024)):
+        if size >= scale and size % scale == 0:
+            return '%d%s' % (size // scale, unit)
+    return str(size)
+
+class Sample:
+    """
+    about size characters of generated source text, and the text
+    saved in each encoding; made when first asked for, since the big
+    sizes take a while
+    """
+    def __init__(self, folder, size):
+        self.folder = folder
+        self.size = size
+        self.blocks = None
+        self.whole = None
+        self.files = {}
+
+    def textBlocks(self):
+        if self.blocks is None:
+            self.blocks = []
+            line = total = 0
+            while total < self.size:
+                lines = []
+                length = 0
+                while length < blockSize and total + length < self.size:
+                    text = lineFormat % (line, line, line % 97)
+                    lines.append(text)
+                    length += len(text)
+                    line += 1
+                block = ''.join(lines)[:self.size - total]
+                self.blocks.append(block)
+                total += len(block)
+        return self.blocks
+
+    def text(self):
+        if self.whole is None:
+            self.whole = ''.join(self.textBlocks())
+        return self.whole
+
+    def document(self):
+        document = PieceTable()
+        for block in self.textBlocks():
+            document.append(block)
+        return document
+
+    def file(self, encoding):
+        if encoding not in self.files:
+            name = os.path.join(self.folder, '%s.%s.txt' % (sizeName(self.size),
+                                                            encoding))
+            saveChunks(name, self.textBlocks(), encoding, '\n')
+            self.files[encoding] = name
+        return self.files[encoding]
+
+    def edited(self, changes=100):
+        """
+        the text with changes lines replaced, for diffs
+        """
+        lines = self.text().split('\n')
+        chooser = random.Random(self.size)
+        for index in chooser.sample(range(len(lines)), min(changes, len(lines))):
+            lines[index] = 'changed ' + lines[index]
+        return '\n'.join(lines)
+
+    def drop(self):
+        self.blocks = self.whole = None
+
+def timed(action, *args):
+    start = time.perf_counter()
+    action(*args)
+    return time.perf_counter() - start
+
+# core benchmarks: each takes a Sample and returns seconds for one run
+
+def coreOpen(sample, encoding):
+    name = sample.file(encoding)
+    def load():
+        data = openBytes(name)
+        try:
+            document = PieceTable()
+            for (done, text) in decodeChunks(data, encoding, 256 * 1024):
+                document.append(text)
+        finally:
+            closeBytes(data)
+    return timed(load)
+
+def coreDetect(sample, encoding):
+    data = openBytes(sample.file(encoding))
+    try:
+        return timed(detectEncoding, data)
+    finally:
+        closeBytes(data)
+
+def coreSave(sample, encoding):
+    document = sample.document()
+    name = os.path.join(sample.folder, 'saved.txt')
+    try:
+        return timed(lambda: saveChunks(name, document.chunks(size=blockSize),
+                                        encoding, '\n'))
+    finally:
+        os.remove(name)
+
+def coreFind(sample):
+    document = sample.document()
+    pattern, reach = searchPattern(findKey, True)
+    return timed(MatchIndex, document, pattern, reach)
+
+def coreReplace(sample):
+    """
+    as onReplaceAll: gather every replacement, then one rewrite
+    """
+    document = sample.document()
+    pattern, reach = searchPattern(findKey, True)
+    def replace():
+        changes = list(replacements(document, pattern, replaceWith,
+                                    reach=reach))
+        if changes:
+            start, end = changes[0][0], changes[-1][1]
+            parts, pos = [], start
+            for (first, last, new) in changes:
+                parts.append(document.get(pos, first))
+                parts.append(new)
+                pos = last
+            document.delete(start, end - start)
+            document.insert(start, ''.join(parts))
+    return timed(replace)
+
+def coreGoto(sample, count=1000):
+    document = sample.document()
+    chooser = random.Random(1)
+    lines = [chooser.randrange(document.lineCount()) + 1 for i in range(count)]
+    def goto():
+        for line in lines:
+            document.offset(line)
+    return timed(goto)
+
+def coreEdit(sample, count=1000):
+    """
+    scattered small inserts and deletes, as in typing
+    """
+    document = sample.document()
+    chooser = random.Random(2)
+    def edit():
+        for i in range(count):
+            offset = chooser.randrange(len(document))
+            if i % 2:
+                document.delete(offset, 1)
+            else:
+                document.insert(offset, 'x')
+    return timed(edit)
+
+def coreIndex(sample):
+    def index():
+        lines = MappedLines(sample.file('utf-8'))
+        try:
+            lines.extendIndex()
+            lines.lineOffset(lines.lineCount() // 2)
+        finally:
+            lines.close()
+    return timed(index)
+
+def coreSyntax(sample):
+    def scan():
+        state = ''
+        for line in sample.text().split('\n'):
+            tokens, state = scanLine(line, state)
+    return timed(scan)
+
+def coreDiff(sample):
+    text, edited = sample.text(), sample.edited()
+    return timed(diffTexts, text, edited)
+
+def coreBenchmarks():
+    """
+    list of (name, function, largest size worth timing or None)
+    """
+    benchmarks = []
+    for encoding in encodings:
+        benchmarks += [('open.' + encoding,
+                        lambda sample, e=encoding: coreOpen(sample, e), None),
+                       ('detect.' + encoding,
+                        lambda sample, e=encoding: coreDetect(sample, e), None),
+                       ('save.' + encoding,
+                        lambda sample, e=encoding: coreSave(sample, e), None)]
+    benchmarks += [('find', coreFind, None),
+                   ('replace', coreReplace, None),
+                   ('goto', coreGoto, None),
+                   ('edit', coreEdit, None),
+                   ('index.mapped', coreIndex, None),
+                   ('syntax.scan', coreSyntax, 256 * 1024 ** 2),
+                   ('diff', coreDiff, 256 * 1024 ** 2)]
+    return benchmarks
+
+# GUI benchmarks, through a TextEditorComponent
+
+def startDisplay():
+    """
+    a display for Tk: the current one, else a new Xvfb server, whose
+    process is returned so it can be stopped; raises OSError if none
+    """
+    if os.environ.get('DISPLAY') or sys.platform in ('win32', 'darwin'):
+        return None
+    if not shutil.which('Xvfb'):
+        raise OSError('no display, and Xvfb is not installed')
+    for number in range(99, 199):
+        if os.path.exists('/tmp/.X%d-lock' % number):
+            continue
+        server = subprocess.Popen(['Xvfb', ':%d' % number, '-screen', '0',
+                                   '1280x1024x24', '-nolisten', 'tcp'],
+                                  stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+        for wait in range(50):
+            if os.path.exists('/tmp/.X11-unix/X%d' % number):
+                os.environ['DISPLAY'] = ':%d' % number
+                return server
+            if server.poll() is not None:
+                break
+            time.sleep(0.1)
+        server.kill()
+    raise OSError('could not start Xvfb')
+
+class GuiBench:
+    """
+    one editor component, driven by calling its command methods as the
+    menus do; dialogs are answered up front through the editor's own
+    settings, and Save As is given its file name
+    """
+    def __init__(self, folder):
+        if __package__:
+            from p_python.TextEditor import PyNote
+        else:
+            import PyNote
+        from tkinter import Tk
+        self.module = PyNote
+        self.folder = folder
+        PyNote.configs['viewThreshold'] = float('inf')  # never offer viewer
+        self.root = Tk()
+        self.editor = PyNote.TextEditorComponent(self.root)
+        self.editor.journal.enabled = False     # time the editor, not disk
+        self.editor.openAskUser = self.editor.savesAskUser = False
+        self.editor.savesUseKnownEncoding = 2
+        self.saveAs = os.path.join(folder, 'saved-as.txt')
+        PyNote.asksaveasfilename = lambda **options: self.saveAs
+
+    def idle(self):
+        self.root.update()
+
+    def until(self, done):
+        while not done():
+            self.root.update()
+        self.root.update()
+
+    def reset(self):
+        self.editor.clearModified()
+        self.idle()
+
+    def open(self, sample, encoding):
+        name = sample.file(encoding)
+        self.reset()
+        loaded = []
+        start = time.perf_counter()
+        self.editor.onOpen(name, encoding, then=lambda: loaded.append(1))
+        self.until(lambda: loaded or not self.editor.loader)
+        return time.perf_counter() - start
+
+    def save(self, sample, encoding, saveAs=False):
+        self.open(sample, encoding)
+        self.editor.text.edit_modified(1)
+        start = time.perf_counter()
+        if saveAs:
+            self.editor.onSaveAs()
+        else:
+            self.editor.onSave()
+        self.editor.finishSave()
+        self.idle()
+        return time.perf_counter() - start
+
+    def loaded(self, sample):
+        if self.editor.getFileName() != sample.file('utf-8'):
+            self.open(sample, 'utf-8')
+        self.editor.endSearch()
+        self.editor.text.mark_set('insert', '1.0')
+
+    def find(self, sample):
+        self.loaded(sample)
+        start = time.perf_counter()
+        self.editor.onFind(lastkey=findKey)
+        self.idle()
+        return time.perf_counter() - start
+
+    def replace(self, sample):
+        self.loaded(sample)
+        self.editor.onFind(lastkey=findKey)
+        self.idle()
+        start = time.perf_counter()
+        self.editor.onDoReplace(findKey, replaceWith)
+        self.idle()
+        return time.perf_counter() - start
+
+    def goto(self, sample):
+        self.loaded(sample)
+        line = int(self.editor.text.index('end').split('.')[0]) // 2
+        start = time.perf_counter()
+        self.editor.onGoto(forceline=max(line, 1))
+        self.idle()
+        return time.perf_counter() - start
+
+    def setAllText(self, sample):
+        text = sample.text()
+        self.reset()
+        self.editor.setFileName(None)
+        inserted = []
+        start = time.perf_counter()
+        self.editor.setAllText(text)
+        self.editor.whenInserted(lambda: inserted.append(1))
+        self.until(lambda: inserted)
+        return time.perf_counter() - start
+
+    def benchmarks(self):
+        benchmarks = []
+        for encoding in encodings:
+            benchmarks += [('gui.onOpen.' + encoding,
+                            lambda sample, e=encoding: self.open(sample, e)),
+                           ('gui.onSave.' + encoding,
+                            lambda sample, e=encoding: self.save(sample, e))]
+        benchmarks += [('gui.onSaveAs',
+                        lambda sample: self.save(sample, 'utf-8', True)),
+                       ('gui.onFind', self.find),
+                       ('gui.onDoReplace', self.replace),
+                       ('gui.onGoto', self.goto),
+                       ('gui.setAllText', self.setAllText)]
+        return [(name, run, None) for (name, run) in benchmarks]
+
+    def close(self):
+        self.editor.onCancelLoad()
+        self.root.destroy()
+
+# running and reporting
+
+def runAll(samples, benchmarks, repeat, only, results):
+    for sample in samples:
+        for (name, run, largest) in benchmarks:
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            if largest is not None and sample.size > largest:
+                continue
+            key = '%s@%s' % (name, sizeName(sample.size))
+            runs = [run(sample) for i in range(repeat)]
+            best = min(runs)
+            results[key] = {'name': name, 'size': sample.size,
+                            'seconds': best, 'runs': runs,
+                            'MBps': sample.size / best / 1e6 if best else None}
+            print('%-28s %10.4fs' % (key, best), flush=True)
+        sample.drop()
+
+def compare(results, baseline, tolerance, floor, only=(), sizes=None):
+    """
+    print each result against the baseline's; returns (slower, missing)
+    lists of keys: those slower by more than tolerance (a ratio, as
+    1.10), ignoring times under floor seconds, which are mostly timer
+    noise, and those in the baseline that this run should have timed
+    (by only and sizes) but did not
+    """
+    slower = []
+    print('\n%-28s %10s %10s %7s' % ('benchmark', 'baseline', 'now', 'ratio'))
+    for (key, result) in sorted(results.items()):
+        old = baseline.get(key)
+        if not old or not old['seconds']:
+            continue
+        ratio = result['seconds'] / old['seconds']
+        flag = ''
+        if ratio > tolerance and result['seconds'] >= floor:
+            slower.append(key)
+            flag = '  SLOWER'
+        print('%-28s %9.4fs %9.4fs %6.2fx%s' % (key, old['seconds'],
+                                                result['seconds'], ratio, flag))
+    missing = []
+    for (key, old) in sorted(baseline.items()):
+        if key in results:
+            continue
+        if only and not any(old['name'].startswith(prefix) for prefix in only):
+            continue
+        if sizes is not None and old['size'] not in sizes:
+            continue
+        missing.append(key)
+        print('%-28s %9.4fs %10s' % (key, old['seconds'], 'MISSING'))
+    return slower, missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='PyNote benchmarks')
+    parser.add_argument('--sizes', default='1K,1M,16M',
+                        help='file sizes, as 1K,1M,64M,1G')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of each benchmark; the best is kept')
+    parser.add_argument('--gui', action='store_true',
+                        help='also time the editor widget (Xvfb if need be)')
+    parser.add_argument('--only', default='',
+                        help='comma-separated benchmark name prefixes')
+    parser.add_argument('--output', default='bench.json')
+    parser.add_argument('--baseline', help='earlier JSON output to compare')
+    parser.add_argument('--tolerance', type=float, default=1.10,
+                        help='slowdown ratio counted as a regression')
+    parser.add_argument('--floor', type=float, default=0.001,
+                        help='seconds below which slowdowns are not counted')
+    args = parser.parse_args(argv)
+
+    only = [prefix for prefix in args.only.split(',') if prefix]
+    folder = tempfile.mkdtemp(prefix='pynote-bench-')
+    samples = [Sample(folder, parseSize(size)) for size in args.sizes.split(',')]
+    results = {}
+    report = {'python': platform.python_version(),
+              'platform': platform.platform(),
+              'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'sizes': [sample.size for sample in samples],
+              'repeat': args.repeat, 'results': results}
+    server = None
+    try:
+        runAll(samples, coreBenchmarks(), args.repeat, only, results)
+        if args.gui:
+            try:
+                server = startDisplay()
+                bench = GuiBench(folder)
+            except Exception as why:
+                report['guiSkipped'] = str(why)
+                print('GUI benchmarks skipped:', why)
+            else:
+                try:
+                    runAll(samples, bench.benchmarks(), args.repeat, only,
+                           results)
+                finally:
+                    bench.close()
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+        if server:
+            server.kill()
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=1)
+    print('results in', args.output)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)['results']
+        slower, missing = compare(results, baseline, args.tolerance,
+                                  args.floor, only, report['sizes'])
+        if slower:
+            print('%d regressions over %.0f%%' % (len(slower),
+                                                 (args.tolerance - 1) * 100))
+        if missing:
+            print('%d benchmarks in the baseline were not run' % len(missing))
+        if slower or missing:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Read-only, memory-mapped access by line to files too big to load into
+a Text widget; no tkinter here.  Nothing is scanned at open: line
+offsets are found on demand and remembered every checkpointEvery lines,
+so opening takes constant time and memory stays flat.
+"""
+import bisect, mmap, os
+
+class MappedLines:
+    checkpointEvery = 4096          # lines between remembered offsets
+    maxLineBytes = 64 * 1024        # longer lines come back in segments
+    scanChunk = 1024 * 1024         # bytes per newline count while indexing
+
+    def __init__(self, filename):
+        self.file = open(filename, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size:
+            self.data = mmap.mmap(self.file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self.data = b''
+        self.checkpoints = [0]      # offset of lines 1, 1+every, ...
+        self.scanPos = 0            # bytes indexed so far
+        self.scanLine = 0           # newlines in data[:scanPos]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    # line index
+
+    def indexed(self):
+        return self.scanPos >= self.size
+
+    def extendIndex(self, limit=None):
+        """
+        index at most limit more bytes (all if None);
+        returns True once the whole file is indexed
+        """
+        data, every = self.data, self.checkpointEvery
+        stop = self.size if limit is None else min(self.scanPos + limit,
+                                                   self.size)
+        while self.scanPos < stop:
+            need = len(self.checkpoints) * every - self.scanLine
+            end = min(self.scanPos + self.scanChunk, stop)
+            count = data[self.scanPos:end].count(b'\n')
+            if count < need:
+                self.scanPos = end
+                self.scanLine += count
+            else:
+                pos = self.scanPos
+                for i in range(need):
+                    pos = data.find(b'\n', pos) + 1
+                self.checkpoints.append(pos)
+                self.scanPos = pos
+                self.scanLine += need
+        return self.indexed()
+
+    def lineCount(self):
+        """
+        total lines; indexes the whole file if not done yet
+        """
+        self.extendIndex()
+        if self.size and self.data[self.size-1:self.size] != b'\n':
+            return self.scanLine + 1
+        return max(self.scanLine, 1)
+
+    def lineOffset(self, lineno):
+        """
+        byte offset of 1-based line lineno, or None if past the end
+        """
+        if lineno < 1:
+            return None
+        index = (lineno - 1) // self.checkpointEvery
+        while index >= len(self.checkpoints) and not self.indexed():
+            self.extendIndex(self.scanChunk * 16)
+        if index >= len(self.checkpoints):
+            index = len(self.checkpoints) - 1
+        pos = self.checkpoints[index]
+        for i in range(lineno - 1 - index * self.checkpointEvery):
+            pos = self.data.find(b'\n', pos) + 1
+            if pos == 0 or pos >= self.size:
+                return None
+        return pos
+
+    def lineNumber(self, offset):
+        """
+        1-based number of the line holding byte offset
+        """
+        while self.scanPos < offset and not self.indexed():
+            self.extendIndex(self.scanChunk * 16)
+        index = bisect.bisect_right(self.checkpoints, offset) - 1
+        start = self.checkpoints[index]
+        return (index * self.checkpointEvery +
+                self.data[start:offset].count(b'\n') + 1)
+
+    # line access
+
+    def lineStart(self, offset):
+        """
+        offset of the start of the line (or long-line segment) at offset;
+        segments are whole maxLineBytes steps from the line's real start,
+        as readLine cuts them
+        """
+        offset = max(0, min(offset, self.size))
+        index = bisect.bisect_right(self.checkpoints, offset) - 1
+        start = self.data.rfind(b'\n', self.checkpoints[index], offset) + 1
+        start = start or self.checkpoints[index]
+        return start + (offset - start) // self.maxLineBytes * self.maxLineBytes
+
+    def readLine(self, offset):
+        """
+        return (line bytes without newline, offset of the next line)
+        """
+        limit = min(offset + self.maxLineBytes, self.size)
+        newline = self.data.find(b'\n', offset, limit)
+        if newline >= 0:
+            return self.data[offset:newline], newline + 1
+        return self.data[offset:limit], limit
+
+    def linesFrom(self, offset, count):
+        """
+        list of up to count (offset, line bytes) pairs from offset on
+        """
+        lines = []
+        while len(lines) < count and offset < self.size:
+            line, next = self.readLine(offset)
+            lines.append((offset, line))
+            offset = next
+        return lines
+
+    def backLines(self, offset, count):
+        """
+        offset of the line count lines before the one at offset
+        """
+        offset = self.lineStart(offset)
+        for i in range(count):
+            if offset == 0:
+                break
+            if self.data[offset-1:offset] == b'\n':
+                offset = self.lineStart(offset - 1)
+            else:
+                offset -= self.maxLineBytes     # same line, segment before
+        return offset
+
+    def lastPage(self, rows):
+        """
+        offset of the top line when the last line is at the bottom
+        """
+        return self.backLines(max(self.size - 1, 0), rows - 1)
+
+    # searching
+
+    def find(self, pattern, start=0):
+        """
+        first match of compiled bytes regex pattern at or after start
+        """
+        return pattern.search(self.data, start)
+
+    def findBefore(self, pattern, end, overlap=4096):
+        """
+        last match of pattern ending by end, searching back a chunk at
+        a time; windows overlap so matches up to overlap bytes long
+        that straddle a chunk boundary are still found
+        """
+        stop = end
+        while stop > 0:
+            start = max(0, stop - self.scanChunk)
+            last = None
+            for last in pattern.finditer(self.data, start, stop):
+                pass
+            if last or start == 0:
+                return last
+            stop = start + overlap
+        return None
+
+    def bytes(self, start, end):
+        return self.data[start:end]
@@ -0,0 +1,186 @@
+"""
+Line diffs for PyNote's compare view; no tkinter here.
+
+Lines are hashed to small ints and lines found in only one file are
+set aside (they can never match).  Lines found once in each file that
+keep their order are matched first, as anchors, and the stretches
+between anchors are compared with Myers' O(ND) algorithm in its
+linear-space form: find the middle of the best edit path by searching
+from both ends at once, split there, and repeat on each half.  Common
+leading and trailing lines are stripped first at every level, so files
+that are mostly the same cost little more than one pass over their
+lines; a search that runs past a cost limit settles for a good split
+instead of the best one, so no input takes quadratic time.
+"""
+import bisect
+from collections import Counter
+
+costLimit = 64                                  # edits before settling
+
+def middle(a, alo, ahi, b, blo, bhi):
+    """
+    (x, y) where an optimal path from (alo, blo) to (ahi, bhi)
+    crosses the middle of its edits, or None if nothing matches;
+    past costLimit edits, the furthest point reached from (alo, blo)
+    """
+    n, m = ahi - alo, bhi - blo
+    best = None                                 # (x + y, x, y) reached
+    limit = (n + m + 1) // 2
+    offset = limit
+    size = 2 * limit + 2
+    forward = [-1] * size
+    backward = [-1] * size
+    forward[offset + 1] = backward[offset + 1] = 0
+    delta = n - m
+    odd = delta % 2 != 0
+    k1start = k1end = k2start = k2end = 0
+    for d in range(limit):
+        for k in range(-d + k1start, d + 1 - k1end, 2):
+            i = offset + k
+            if k == -d or (k != d and forward[i - 1] < forward[i + 1]):
+                x = forward[i + 1]
+            else:
+                x = forward[i - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            forward[i] = x
+            if x > n:
+                k1end += 2
+            elif y > m:
+                k1start += 2
+            else:
+                if (x < n or y < m) and (not best or x + y > best[0]):
+                    best = (x + y, x, y)
+                if not odd:
+                    continue
+                j = offset + delta - k
+                if 0 <= j < size and backward[j] != -1 and x >= n - backward[j]:
+                    return alo + x, blo + y
+        if d >= costLimit and best:
+            return alo + best[1], blo + best[2]
+        for k in range(-d + k2start, d + 1 - k2end, 2):
+            i = offset + k
+            if k == -d or (k != d and backward[i - 1] < backward[i + 1]):
+                x = backward[i + 1]
+            else:
+                x = backward[i - 1] + 1
+            y = x - k
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            backward[i] = x
+            if x > n:
+                k2end += 2
+            elif y > m:
+                k2start += 2
+            elif not odd:
+                j = offset + delta - k
+                if 0 <= j < size and forward[j] != -1:
+                    fx = forward[j]
+                    if fx >= n - x:
+                        return alo + fx, blo + fx - (j - offset)
+    return None
+
+def matchRuns(a, b):
+    """
+    list of (x, y, count): a[x:x+count] == b[y:y+count], in order,
+    forming a longest common subsequence of a and b
+    """
+    runs = []
+    stack = [('range', 0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if item[0] == 'run':
+            runs.append(item[1:])
+            continue
+        alo, ahi, blo, bhi = item[1:]
+        start = alo
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            alo += 1
+            blo += 1
+        if alo > start:
+            runs.append((start, blo - (alo - start), alo - start))
+        end = ahi
+        while ahi > alo and bhi > blo and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+        if end > ahi:
+            stack.append(('run', ahi, bhi, end - ahi))
+        if alo == ahi or blo == bhi:
+            continue
+        split = middle(a, alo, ahi, b, blo, bhi)
+        if split:
+            x, y = split
+            stack.append(('range', x, ahi, y, bhi))
+            stack.append(('range', alo, x, blo, y))
+    return runs
+
+def anchors(a, b):
+    """
+    list of (i, j) with a[i] == b[j] found once in each of a and b,
+    the longest such chain in order in both
+    """
+    countA, countB = Counter(a), Counter(b)
+    where = {key: j for (j, key) in enumerate(b) if countB[key] == 1}
+    pairs = [(i, where[key]) for (i, key) in enumerate(a)
+             if countA[key] == 1 and key in where]
+    tails, ends, previous = [], [], []          # patience sort on j
+    for (n, (i, j)) in enumerate(pairs):
+        pile = bisect.bisect_left(tails, j)
+        if pile == len(tails):
+            tails.append(j)
+            ends.append(n)
+        else:
+            tails[pile] = j
+            ends[pile] = n
+        previous.append(ends[pile - 1] if pile else None)
+    chain = []
+    n = ends[-1] if ends else None
+    while n is not None:
+        chain.append(pairs[n])
+        n = previous[n]
+    chain.reverse()
+    return chain
+
+def diffLines(a, b):
+    """
+    list of (a0, a1, b0, b1) hunks, each replacing lines a[a0:a1]
+    with b[b0:b1], that turn list of lines a into b
+    """
+    ids = {}
+    keysA = [ids.setdefault(line, len(ids)) for line in a]
+    keysB = [ids.setdefault(line, len(ids)) for line in b]
+    inA, inB = set(keysA), set(keysB)
+    indexA = [i for (i, key) in enumerate(keysA) if key in inB]
+    indexB = [j for (j, key) in enumerate(keysB) if key in inA]
+    a, b = [keysA[i] for i in indexA], [keysB[j] for j in indexB]
+
+    runs = []
+    x = y = 0
+    for (i, j) in anchors(a, b) + [(len(a), len(b))]:
+        if x < i and y < j:
+            runs.extend((x + p, y + q, count)
+                        for (p, q, count) in matchRuns(a[x:i], b[y:j]))
+        if i < len(a):
+            runs.append((i, j, 1))
+        x, y = i + 1, j + 1
+
+    hunks = []
+    nextA = nextB = 0
+    for (x, y, count) in runs:
+        for t in range(count):
+            i, j = indexA[x + t], indexB[y + t]
+            if i != nextA or j != nextB:
+                hunks.append((nextA, i, nextB, j))
+            nextA, nextB = i + 1, j + 1
+    if nextA < len(keysA) or nextB < len(keysB):
+        hunks.append((nextA, len(keysA), nextB, len(keysB)))
+    return hunks
+
+def diffTexts(a, b):
+    """
+    worker process entry point: hunks between two texts, by line
+    """
+    return diffLines(a.split('\n'), b.split('\n'))
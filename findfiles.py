@@ -0,0 +1,164 @@
+"""
+Find in Files for PyNote: walk a directory tree and search its files
+in a pool of worker processes; no tkinter here.  Results arrive on a
+queue as each batch of files is scanned, for the GUI to poll.
+"""
+import os, queue, threading
+
+if __package__:
+    from p_python.TextEditor.textio import detectEncoding
+    from p_python.TextEditor.matchindex import searchPattern
+else:
+    from textio import detectEncoding
+    from matchindex import searchPattern
+
+skipDirs = {'.git', '.hg', '.svn', '__pycache__', '.tox', '.venv', 'node_modules'}
+
+def scanFile(path, pattern, preferred, maxBytes, maxHits):
+    """
+    list of (path, line, col, line text) hits in one file; binary and
+    oversized files are skipped; the encoding is sniffed as for opens
+    """
+    try:
+        if os.path.getsize(path) > maxBytes:
+            return []
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError:
+        return []
+    guesses = detectEncoding(data, preferred)
+    if not guesses:
+        if b'\0' in data[:8192]:
+            return []                               # binary
+        encoding = preferred or 'latin-1'
+    else:
+        encoding = guesses[0][0]
+    text = data.decode(encoding, 'replace')
+
+    hits = []
+    line, linestart = 1, 0
+    for match in pattern.finditer(text):
+        if match.end() == match.start():
+            continue
+        line += text.count('\n', linestart, match.start())
+        linestart = text.rfind('\n', 0, match.start()) + 1
+        lineend = text.find('\n', match.start())
+        if lineend < 0:
+            lineend = len(text)
+        snippet = text[linestart:min(lineend, linestart + 200)].rstrip('\r')
+        hits.append((path, line, match.start() - linestart, snippet))
+        if len(hits) >= maxHits:
+            break
+    return hits
+
+def scanBatch(paths, key, nocase, regex, preferred, maxBytes, maxHits):
+    """
+    worker process entry point: search a batch of files
+    """
+    pattern, reach = searchPattern(key, nocase, regex)     # cached per process
+    hits = []
+    for path in paths:
+        hits.extend(scanFile(path, pattern, preferred, maxBytes, maxHits))
+    return hits
+
+def poolContext(*modules):
+    """
+    multiprocessing context for worker pools: never fork, since the GUI
+    process has threads whose locks a forked child would inherit; a
+    forkserver (preloading modules) where there is one, else spawn
+    """
+    import multiprocessing                      # not needed until a pool
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(list(modules))
+        return context
+    return multiprocessing.get_context('spawn')
+
+def walkFiles(root, cancelled):
+    for (folder, subdirs, files) in os.walk(root):
+        if cancelled.is_set():
+            return
+        subdirs[:] = [name for name in subdirs if name not in skipDirs]
+        for name in files:
+            yield os.path.join(folder, name)
+
+class FileSearch:
+    """
+    one Find in Files run: a walker thread feeds batches of paths to a
+    process pool, and each batch's hits are put on self.results as a
+    list; None is put there when the run is over
+    """
+    batchSize = 64              # files per worker task
+    maxBytes = 32 * 1024 * 1024   # larger files are skipped
+
+    def __init__(self, root, key, nocase=False, regex=False, preferred='',
+                 maxResults=10000, workers=None):
+        searchPattern(key, nocase, regex)       # bad regexes fail here
+        self.root = root
+        self.args = (key, nocase, regex, preferred, self.maxBytes, maxResults)
+        self.maxResults = maxResults
+        self.workers = workers or os.cpu_count() or 1
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+        self.found = 0
+        self.files = 0
+        self.pending = threading.Semaphore(self.workers * 4)   # in flight
+
+    def start(self):
+        """
+        make the pool here, on the GUI thread; the walker only submits
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        self.executor = ProcessPoolExecutor(self.workers,
+                                            mp_context=poolContext(__name__))
+        self.walker = threading.Thread(target=self.walk, daemon=True)
+        self.walker.start()
+
+    def walk(self):
+        futures = []
+        batch = []
+        try:
+            for path in walkFiles(self.root, self.cancelled):
+                batch.append(path)
+                self.files += 1
+                if len(batch) == self.batchSize:
+                    futures.append(self.submit(batch))
+                    batch = []
+                if self.cancelled.is_set():
+                    break
+            if batch and not self.cancelled.is_set():
+                futures.append(self.submit(batch))
+        except BaseException:
+            self.cancel()                       # no pool: end the run
+            raise
+        finally:
+            if self.cancelled.is_set():
+                for future in futures:
+                    future.cancel()
+            for future in futures:
+                try:
+                    future.exception()          # wait for every batch
+                except BaseException:
+                    pass
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.results.put(None)
+
+    def submit(self, batch):
+        self.pending.acquire()
+        future = self.executor.submit(scanBatch, batch, *self.args)
+        future.add_done_callback(self.collect)
+        return future
+
+    def collect(self, future):
+        self.pending.release()
+        if future.cancelled() or future.exception() or self.cancelled.is_set():
+            return
+        hits = future.result()[:self.maxResults - self.found]
+        self.found += len(hits)
+        if hits:
+            self.results.put(hits)
+        if self.found >= self.maxResults:
+            self.cancel()
+
+    def cancel(self):
+        self.cancelled.set()
@@ -25,14 +25,14 @@ class GuiMaker(Frame):
         for (name, key, items) in self.menuBar:
             mbutton = Menubutton(menubar, text=name, underline=key)
             mbutton.pack(side=LEFT)
-            pulldown = Menu(mbutton, tearoff=False)
-            self.addMenuItems(pulldown, items)
+            pulldown = self.lazyMenu(mbutton, items)
             mbutton.config(menu=pulldown)
 
         if self.helpButton:
             Button(menubar, text='Help',
                    cursor = 'gumby', relief=FLAT,
-                   command = self.help).pack(side=RIGHT)
+                   command = self.wrapCommand('Help', self.help)
+                   ).pack(side=RIGHT)
 
     def addMenuItems(self, menu, items):
         for item in items:
@@ -42,18 +42,37 @@ class GuiMaker(Frame):
                 for num in item:
                     menu.entryconfig(num, state=DISABLED)
             elif type (item[2]) != list:
-                menu.add_command(label=item[0], underline=item[1], command=item[2])
+                menu.add_command(label=item[0], underline=item[1],
+                                 command=self.wrapCommand(item[0], item[2]))
             else:
-                pullover = Menu(menu, tearoff=False)
-                self.addMenuItems(pullover, item[2])
+                pullover = self.lazyMenu(menu, item[2])
                 menu.add_cascade(label=item[0], underline=item[1], menu=pullover)
 
+    def wrapCommand(self, label, command):
+        """
+        The callback installed for a menu or toolbar command: subclasses
+        may wrap it, to time or log commands
+        """
+        return command
+
+    def lazyMenu(self, parent, items):
+        """
+        Make an empty menu that adds its items when first posted
+        """
+        menu = Menu(parent, tearoff=False)
+        def build():
+            menu.config(postcommand='')
+            self.addMenuItems(menu, items)
+        menu.config(postcommand=build)
+        return menu
+
     def makeToolBar(self):
         if self.toolBar:
             toolbar = Frame(self, cursor='hand2', relief=SUNKEN, bd=2)
             toolbar.pack(side=BOTTOM, fill=X)
             for (name, action, where) in self.toolBar:
-                Button(toolbar, text=name, command=action).pack(where)
+                Button(toolbar, text=name,
+                       command=self.wrapCommand(name, action)).pack(where)
     def makeWidgets(self):
         name = Label(self, width=40, height=10,
                      relief=SUNKEN, bg='white',
@@ -75,16 +94,17 @@ class GuiMakerWindowMenu(GuiMaker):
         self.master.config(menu=menubar)
 
         for (name, key, items) in self.menuBar:
-            pulldown = Menu(menubar, tearoff=False)
-            self.addMenuItems(pulldown, items)
+            pulldown = self.lazyMenu(menubar, items)
             menubar.add_cascade(label=name, underline=key, menu=pulldown)
 
         if self.helpButton:
             if sys.platform[:3] == 'win':
-                menubar.add_command(label='Help', command=self.help)
+                menubar.add_command(label='Help',
+                                    command=self.wrapCommand('Help', self.help))
             else:
                 pulldown = Menu(menubar, tearoff=False)
-                pulldown.add_command(label='About', command=self.help)
+                pulldown.add_command(label='About',
+                                     command=self.wrapCommand('About', self.help))
                 menubar.add_cascade(label='Help', menu=pulldown)
 
 if __name__ == "__main__":
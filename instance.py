@@ -0,0 +1,127 @@
+"""
+Single-instance support for PyNote; no tkinter here.
+
+The first PyNote listens on a per-user Unix domain socket; later ones
+send it the files they were asked to open, one JSON request per line,
+and exit as soon as it answers.  Requests are {"file": path,
+"encoding": name}, with paths made absolute by the sender.
+"""
+import json, os, socket, tempfile
+
+def socketPath():
+    """
+    the socket's path, in a directory only this user can use
+    """
+    folder = os.environ.get('XDG_RUNTIME_DIR')
+    if not folder or not os.path.isdir(folder):
+        folder = os.path.join(tempfile.gettempdir(), 'pynote-%d' % os.getuid())
+        try:
+            os.mkdir(folder, 0o700)
+        except FileExistsError:
+            pass
+        info = os.lstat(folder)
+        if info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise OSError('unsafe socket directory: ' + folder)
+    return os.path.join(folder, 'pynote.sock')
+
+def supported():
+    return hasattr(socket, 'AF_UNIX')
+
+def listening(path):
+    """
+    is an instance accepting on path?
+    """
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+def sendFiles(path, files, timeout=2.0):
+    """
+    send (filename, encoding) pairs to a running instance, or ask it
+    for an empty window if there are none; returns False if there is
+    no instance, so the caller should start up itself
+    """
+    try:
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    except OSError:
+        return False
+    client.settimeout(timeout)
+    try:
+        client.connect(path)
+        lines = [json.dumps({'file': os.path.abspath(name) if name else '',
+                             'encoding': encoding or ''})
+                 for (name, encoding) in files or [('', '')]]
+        client.sendall(('\n'.join(lines) + '\n').encode('utf-8'))
+        client.shutdown(socket.SHUT_WR)
+        return client.recv(16).startswith(b'ok')
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+class InstanceServer:
+    """
+    the listening end: accept() reads one sender's requests; the GUI
+    calls it when the socket is readable, so nothing polls
+    """
+    timeout = 1.0                   # a stalled sender is dropped
+
+    def __init__(self, path):
+        self.path = path
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.bind()
+        except OSError:
+            self.socket.close()
+            raise
+
+    def bind(self):
+        try:
+            self.socket.bind(self.path)
+        except OSError:
+            if listening(self.path):
+                raise                           # someone beat us to it
+            os.unlink(self.path)                # left by a crash
+            self.socket.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self.socket.listen(16)
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def accept(self):
+        """
+        list of (filename, encoding) requests from the next sender
+        """
+        connection, address = self.socket.accept()
+        connection.settimeout(self.timeout)
+        try:
+            data = b''
+            while True:
+                block = connection.recv(65536)
+                if not block:
+                    break
+                data += block
+            requests = []
+            for line in data.decode('utf-8').splitlines():
+                request = json.loads(line)
+                requests.append((request.get('file', ''),
+                                 request.get('encoding', '')))
+            connection.sendall(b'ok\n')
+            return requests
+        except (OSError, ValueError):
+            return []
+        finally:
+            connection.close()
+
+    def close(self):
+        self.socket.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
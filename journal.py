@@ -0,0 +1,289 @@
+"""
+Crash-recovery journals for PyNote buffers; no tkinter here.
+
+Each buffer's edits are appended to a journal file as JSON lines:
+a header naming the baseline, then ["+", offset, text] and ["-",
+offset, length] records.  The baseline is the file on disk when the
+buffer last matched it (checked by size and mtime on replay), else a
+snapshot of the text written alongside.  Journals are written by one
+shared thread that gathers whatever was queued in a short window and
+fsyncs each file once per batch, so typing never waits on the disk.
+Files are named <pid>-<buffer>.<generation>.journal (and .base); a
+new generation starts at each compaction, and journals of processes
+no longer running are offered for replay.
+"""
+import glob, itertools, json, os, queue, sys, threading, time
+
+if __package__:
+    from p_python.TextEditor.piecetable import PieceTable
+    from p_python.TextEditor.textio import decodeChunks
+else:
+    from piecetable import PieceTable
+    from textio import decodeChunks
+
+def defaultFolder():
+    return os.path.join(os.path.expanduser('~'), '.pynote', 'recovery')
+
+class JournalWriter(threading.Thread):
+    """
+    the one thread doing all journal I/O, in queue order
+    """
+    def __init__(self, delay=0.2):
+        threading.Thread.__init__(self, daemon=True)
+        self.delay = delay                  # secs to gather a batch
+        self.jobs = queue.Queue()
+        self.files = {}                     # open journals by path
+
+    def run(self):
+        while True:
+            jobs = [self.jobs.get()]
+            time.sleep(self.delay)
+            while True:
+                try:
+                    jobs.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+            touched = set()
+            for job in jobs:
+                try:
+                    self.perform(job, touched)
+                except OSError:
+                    pass                    # recovery is best effort
+            for file in touched:
+                try:
+                    file.flush()
+                    os.fsync(file.fileno())
+                except (OSError, ValueError):
+                    pass
+            for job in jobs:
+                self.jobs.task_done()
+
+    def perform(self, job, touched):
+        kind, path, data = job
+        if kind == 'append':
+            file = self.files.get(path)
+            if not file:
+                file = self.files[path] = open(path, 'ab')
+            file.write(data)
+            touched.add(file)
+        elif kind == 'snapshot':
+            temp = path + '.tmp'
+            with open(temp, 'wb') as file:
+                for chunk in data.chunks(size=1024 * 1024):
+                    file.write(chunk.encode('utf-8', 'surrogatepass'))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp, path)
+        elif kind == 'remove':
+            file = self.files.pop(path, None)
+            if file:
+                file.close()
+                touched.discard(file)
+            for name in (path, path[:-len('.journal')] + '.base'):
+                if os.path.exists(name):
+                    os.remove(name)
+
+writer = None
+
+def queueJob(kind, path, data=None):
+    global writer
+    if writer is None:
+        writer = JournalWriter()
+        writer.start()
+    writer.jobs.put((kind, path, data))
+
+def flushJournals():
+    """
+    wait until everything queued is on disk
+    """
+    if writer:
+        writer.jobs.join()
+
+class Journal:
+    """
+    one buffer's journal: onEdit is a document edit hook; describe()
+    gives the buffer's current (filename, encoding) for headers
+    """
+    counter = itertools.count(1)
+
+    def __init__(self, document, describe, folder=None, compactAbove=None,
+                 enabled=True):
+        self.document = document
+        self.describe = describe
+        self.folder = folder or defaultFolder()
+        self.compactAbove = compactAbove or 16 * 1024 * 1024
+        self.enabled = enabled
+        self.session = '%d-%d' % (os.getpid(), next(self.counter))
+        self.generation = 0
+        self.path = None                    # journal being appended to
+        self.size = 0
+        self.baseline = None                # file header, else snapshot
+
+    def onEdit(self, kind, offset, text):
+        if not self.enabled:
+            return
+        if kind == 'reset':
+            self.end()                      # whole text replaced
+            self.baseline = None
+            return
+        if not self.path:
+            if self.baseline is None:
+                self.rebase()               # snapshot holds this edit
+                return
+            self.begin(self.baseline)
+        if kind == 'insert':
+            record = ['+', offset, text]
+        else:
+            record = ['-', offset, len(text)]
+        self.append(record)
+        if self.size > self.compactAbove:
+            self.rebase()
+
+    def clean(self, filename=None, encoding=None):
+        """
+        the buffer now matches filename on disk (or is new and empty):
+        drop the journal, and use the file as the next baseline
+        """
+        if not self.enabled:
+            return
+        self.end()
+        self.baseline = None
+        if filename:
+            try:
+                info = os.stat(filename)
+            except OSError:
+                return
+            self.baseline = {'base': 'file', 'path': os.path.abspath(filename),
+                             'size': info.st_size,
+                             'mtime': info.st_mtime_ns}
+
+    def rebase(self):
+        """
+        start a new generation from a snapshot of the text as it is
+        """
+        if self.enabled:
+            self.begin({'base': 'text'}, self.document.snapshot())
+
+    def begin(self, baseline, snapshot=None):
+        old = self.path
+        if not os.path.isdir(self.folder):
+            try:
+                os.makedirs(self.folder, 0o700)
+            except OSError:
+                self.enabled = False
+                return
+        self.generation += 1
+        self.path = os.path.join(self.folder, '%s.%d.journal' %
+                                              (self.session, self.generation))
+        if snapshot is not None:
+            queueJob('snapshot', self.path[:-len('.journal')] + '.base',
+                     snapshot)
+        filename, encoding = self.describe()
+        header = dict(baseline, file=filename or '', encoding=encoding or '')
+        self.size = 0
+        self.append(header)
+        if old:
+            queueJob('remove', old)         # after the new one is written
+
+    def append(self, record):
+        line = (json.dumps(record) + '\n').encode('utf-8', 'surrogatepass')
+        self.size += len(line)
+        queueJob('append', self.path, line)
+
+    def end(self):
+        """
+        remove this buffer's journal: it has nothing left to recover
+        """
+        if self.path:
+            queueJob('remove', self.path)
+            self.path = None
+
+# replay
+
+def running(pid):
+    """
+    is process pid alive?  On Windows os.kill would terminate it, so
+    ask for its exit code instead
+    """
+    if sys.platform == 'win32':
+        import ctypes
+        kernel = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel.OpenProcess(0x1000, False, pid)  # query limited info
+        if not handle:
+            return ctypes.get_last_error() == 5         # access denied: alive
+        try:
+            code = ctypes.c_ulong()
+            if not kernel.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == 259                    # STILL_ACTIVE
+        finally:
+            kernel.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+def recoverable(folder=None):
+    """
+    latest journal of each buffer left by a process that has ended
+    """
+    latest = {}
+    for path in glob.glob(os.path.join(folder or defaultFolder(),
+                                       '*.journal')):
+        try:
+            session, generation, extension = os.path.basename(path).split('.')
+            pid = int(session.split('-')[0])
+            generation = int(generation)
+        except ValueError:
+            continue
+        if not running(pid) and generation > latest.get(session, (0, ''))[0]:
+            latest[session] = (generation, path)
+    return sorted(path for (generation, path) in latest.values())
+
+def recover(path):
+    """
+    (header, text) replayed from a journal; raises OSError or
+    ValueError if the baseline is missing or the file has changed
+    """
+    with open(path, 'rb') as file:
+        lines = file.read().split(b'\n')
+    lines.pop()                             # empty, or torn by the crash
+    header = json.loads(lines[0].decode('utf-8', 'surrogatepass'))
+    if header['base'] == 'text':
+        with open(path[:-len('.journal')] + '.base', 'rb') as file:
+            text = file.read().decode('utf-8', 'surrogatepass')
+    else:
+        info = os.stat(header['path'])
+        if (info.st_size, info.st_mtime_ns) != (header['size'],
+                                                header['mtime']):
+            raise ValueError('%s has changed since' % header['path'])
+        with open(header['path'], 'rb') as file:
+            data = file.read()
+        encoding = header['encoding'] or 'latin-1'      # loaded as raw bytes
+        text = ''.join(text for (done, text) in decodeChunks(data, encoding))
+    document = PieceTable(text)
+    for line in lines[1:]:
+        try:
+            record = json.loads(line.decode('utf-8', 'surrogatepass'))
+        except ValueError:
+            break                           # torn by the crash
+        if record[0] == '+':
+            document.insert(record[1], record[2])
+        else:
+            document.delete(record[1], record[2])
+    return header, document.getText()
+
+def removeSession(path):
+    """
+    delete every generation of the buffer journal path belongs to
+    """
+    session = os.path.basename(path).split('.')[0]
+    folder = os.path.dirname(path)
+    for name in glob.glob(os.path.join(folder, session + '.*')):
+        try:
+            os.remove(name)
+        except OSError:
+            pass
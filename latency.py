@@ -0,0 +1,152 @@
+"""
+Command latency statistics for PyNote; no tkinter here.
+
+The GUI calls begin() as a menu command or key binding is invoked, and
+end() once the event loop is next idle, so each time covers the redraw
+the command caused.  Times go into a histogram per command.  While a
+command runs, a watchdog thread checks on it; one still running past
+the slow threshold gets a sample of the GUI thread's stack, which is
+logged with its time when it ends.  The clock is paused while a modal
+dialog waits on the user.  Nothing here runs unless timing
+was asked for: the GUI installs its callbacks unwrapped otherwise.
+"""
+import os, sys, threading, time, traceback
+
+class CommandStats:
+    bounds = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)  # ms
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.buckets = [0] * (len(self.bounds) + 1)    # last: over 5s
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        self.longest = max(self.longest, ms)
+        for (index, bound) in enumerate(self.bounds):
+            if ms <= bound:
+                self.buckets[index] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, fraction):
+        """
+        upper bound in ms of the bucket holding the fraction'th time
+        """
+        want = fraction * self.count
+        seen = 0
+        for (index, count) in enumerate(self.buckets):
+            seen += count
+            if seen >= want and count:
+                if index < len(self.bounds):
+                    return self.bounds[index]
+                return self.longest
+        return self.longest
+
+class CommandTimer:
+    """
+    per-command latency histograms; commands slower than slowMs are
+    logged with a stack sample to log (a file name, else stderr)
+    """
+    def __init__(self, slowMs=100, log=''):
+        self.slowMs = slowMs
+        self.log = log
+        self.stats = {}
+        self.running = []               # [name, start, thread, stack]
+        self.watchdog = None
+        self.paused = 0                 # nested pause() calls
+        self.pausedAt = None
+
+    def begin(self, name):
+        entry = [name, time.perf_counter(), threading.get_ident(), None]
+        self.running.append(entry)
+        if self.watchdog is None:
+            self.watchdog = threading.Thread(target=self.watch, daemon=True)
+            self.watchdog.start()
+        return entry
+
+    def pause(self):
+        """
+        a modal dialog is up: what follows is the user's time, not the
+        command's
+        """
+        if not self.paused:
+            self.pausedAt = time.perf_counter()
+        self.paused += 1
+
+    def resume(self):
+        """
+        the dialog is gone: move running commands' starts past the pause
+        """
+        self.paused -= 1
+        if not self.paused:
+            gap = time.perf_counter() - self.pausedAt
+            for entry in self.running:
+                entry[1] += gap
+
+    def end(self, entry):
+        ms = (time.perf_counter() - entry[1]) * 1000
+        if entry in self.running:
+            self.running.remove(entry)
+        stats = self.stats.get(entry[0])
+        if stats is None:
+            stats = self.stats[entry[0]] = CommandStats()
+        stats.add(ms)
+        if ms >= self.slowMs:
+            lines = ['slow command: %s took %.1f ms' % (entry[0], ms)]
+            if entry[3]:
+                lines.append('  stack at %.0f ms:' % self.slowMs)
+                lines.extend('    ' + line for line in entry[3])
+            self.write(lines)
+
+    def watch(self):
+        """
+        watchdog thread: sample the stack of a command running long
+        """
+        while True:
+            time.sleep(self.slowMs / 2000)
+            if self.paused:
+                continue
+            now = time.perf_counter()
+            for entry in list(self.running):
+                if entry[3] is None and (now - entry[1]) * 1000 >= self.slowMs:
+                    frame = sys._current_frames().get(entry[2])
+                    if frame:
+                        entry[3] = ''.join(traceback.format_stack(frame)
+                                           ).rstrip().split('\n')
+
+    def report(self):
+        """
+        lines of per-command statistics, slowest total first
+        """
+        lines = ['command latency, invocation to next idle (ms):',
+                 '  %-30s %6s %8s %8s %6s %6s %6s' %
+                 ('command', 'count', 'mean', 'max', 'p50<=', 'p90<=',
+                  'p99<=')]
+        for (name, stats) in sorted(self.stats.items(),
+                                    key=lambda item: -item[1].total):
+            lines.append('  %-30s %6d %8.1f %8.1f %6g %6g %6g' %
+                         (name[:30], stats.count, stats.total / stats.count,
+                          stats.longest, stats.percentile(0.5),
+                          stats.percentile(0.9), stats.percentile(0.99)))
+        return lines
+
+    def dump(self):
+        """
+        write the report to the log, as at exit
+        """
+        if self.stats:
+            self.write(self.report())
+
+    def write(self, lines):
+        text = '\n'.join(lines) + '\n'
+        if self.log:
+            try:
+                with open(os.path.expanduser(self.log), 'a') as file:
+                    file.write(text)
+                return
+            except OSError:
+                pass
+        sys.stderr.write(text)
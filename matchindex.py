@@ -0,0 +1,392 @@
+"""
+Search sessions for PyNote's document model; no tkinter here.
+
+A MatchIndex finds every match of a compiled pattern once, and keeps
+their offsets in sorted lists.  Next/previous hits are binary searches,
+and edits are folded in by rescanning only a small window around each
+change (regexes that can match a newline have no such window, and are
+rescanned in full by the next search after an edit).  Shifting the matches after an edit is deferred: one pending
+(split, delta) pair covers a run of edits at the same place, so typing
+costs O(log n) rather than a pass over every later match.
+"""
+import re
+from collections import OrderedDict
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:                             # Python before 3.11
+    import sre_parse, sre_constants
+
+class PatternCache:
+    """
+    bounded LRU of compiled patterns, keyed by pattern and flags
+    """
+    def __init__(self, size=64):
+        self.size = size
+        self.patterns = OrderedDict()
+
+    def compile(self, pattern, flags=0):
+        key = (type(pattern), pattern, flags)
+        compiled = self.patterns.get(key)
+        if compiled is not None:
+            self.patterns.move_to_end(key)
+            return compiled
+        compiled = re.compile(pattern, flags)       # may raise re.error
+        self.patterns[key] = compiled
+        if len(self.patterns) > self.size:
+            self.patterns.popitem(last=False)
+        return compiled
+
+patterns = PatternCache()
+
+def searchPattern(key, nocase=False, regex=False):
+    """
+    (compiled pattern, reach) for a str or bytes search key: literal
+    keys are escaped and can reach no further than their own length
+    """
+    flags = re.IGNORECASE if nocase else 0
+    if regex:
+        return patterns.compile(key, flags), None
+    return patterns.compile(re.escape(key), flags), len(key)
+
+def crossesLines(pattern):
+    """
+    true if some match of a compiled pattern may depend on text past a
+    newline: a part of it can match '\\n', or it uses $ without
+    MULTILINE; a conservative answer, from the parsed pattern
+    """
+    def matchesNewline(items, flags):
+        for (op, av) in items:
+            if op is sre_constants.LITERAL:
+                found = av == 10
+            elif op is sre_constants.NOT_LITERAL:
+                found = av != 10
+            elif op is sre_constants.ANY:
+                found = bool(flags & re.DOTALL)
+            elif op is sre_constants.IN:
+                found = inSet(av)
+            elif op is sre_constants.AT:
+                found = (av is sre_constants.AT_END and
+                         not flags & re.MULTILINE)
+            elif op is sre_constants.SUBPATTERN:
+                group, add, remove, items = av
+                found = matchesNewline(items, (flags | add) & ~remove)
+            else:                           # repeats, branches, asserts
+                found = any(matchesNewline(part, flags)
+                            for part in subpatterns(av))
+            if found:
+                return True
+        return False
+
+    def inSet(members):
+        negate, found = False, False
+        for (op, av) in members:
+            if op is sre_constants.NEGATE:
+                negate = True
+            elif op is sre_constants.LITERAL:
+                found = found or av == 10
+            elif op is sre_constants.RANGE:
+                found = found or av[0] <= 10 <= av[1]
+            elif op is sre_constants.CATEGORY:
+                name = str(av)                      # \s, \D, \W...
+                found = found or (('NOT_' in name) !=
+                                  ('SPACE' in name or 'LINEBREAK' in name))
+        return found != negate
+
+    def subpatterns(av):
+        parts = av if isinstance(av, (tuple, list)) else [av]
+        for part in parts:
+            if isinstance(part, sre_parse.SubPattern):
+                yield part
+            elif isinstance(part, list):            # branch alternatives
+                yield from part
+
+    parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    state = getattr(parsed, 'state', None) or parsed.pattern
+    return matchesNewline(parsed, state.flags)
+
+context = 4096          # characters read around a regex chunk
+
+def extent(document, end, reach):
+    """
+    how far text must be read to see every match starting before end
+    """
+    if reach is not None:
+        return min(end + reach, len(document))
+    line, col = document.position(end)
+    return end if col == 0 else document.lineStart(line + 1)
+
+def findAll(document, pattern, reach=None, start=0, end=None,
+            chunk=1024 * 1024):
+    """
+    generator: (offset, match) for each non-empty match of pattern that
+    begins in document[start:end], where offset is the document offset
+    of the match's string; text is pulled chunk characters at a time.
+    Matches are those finditer finds scanning the whole text from start:
+    regex chunks are read with context on both sides, so ^, $, \\b and
+    lookarounds see the real neighbours, and read again further on if a
+    match runs up to the end of what was read
+    """
+    size = len(document)
+    end = size if end is None else end
+    pos = start
+    while pos < end:
+        stop = min(pos + chunk, end)
+        if reach is not None:
+            base, high = pos, extent(document, stop, reach)
+        else:
+            base = max(pos - context, 0)
+            high = min(extent(document, stop, None) + context, size)
+        while True:
+            text = document.get(base, high)
+            found = []
+            for match in pattern.finditer(text, pos - base):
+                if match.start() >= stop - base:
+                    break
+                if match.end() > match.start():
+                    found.append(match)
+            if (reach is not None or high == size or not found or
+                    base + found[-1].end() <= high - context):
+                break
+            high = min(high + max(high - base, context), size)
+        last = stop
+        for match in found:
+            last = max(last, base + match.end())
+            yield base, match
+        pos = last
+
+def replacements(document, pattern, replace, expand=False, reach=None,
+                 chunk=1024 * 1024):
+    """
+    generator: (start, end, new text) for every match in the document;
+    replace is literal text, or a template with group references if
+    expand is true (regex mode)
+    """
+    for (base, match) in findAll(document, pattern, reach, chunk=chunk):
+        text = match.expand(replace) if expand else replace
+        yield base + match.start(), base + match.end(), text
+
+class MatchIndex:
+    chunk = 1024 * 1024             # characters scanned per step
+
+    def __init__(self, document, pattern, reach=None):
+        """
+        pattern is a compiled re; reach is the longest a match can be
+        (literal keys), or None to rescan whole lines around an edit.
+        A regex whose matches may run past a line is rescanned in full
+        at the next use after an edit: no window around it is enough
+        """
+        self.document = document
+        self.pattern = pattern
+        self.reach = reach
+        self.multiline = reach is None and crossesLines(pattern)
+        self.rebuild()
+
+    def rebuild(self):
+        self.starts, self.ends = self.matchesIn(0, len(self.document))
+        self.split = len(self.starts)   # entries from here on are off by
+        self.delta = 0                  # delta, until flushed
+        self.stale = False
+
+    def refresh(self):
+        """
+        rescan everything if the document was replaced since last use
+        """
+        if self.stale:
+            self.rebuild()
+
+    def __len__(self):
+        self.refresh()
+        return len(self.starts)
+
+    # matches, allowing for the pending shift
+
+    def start(self, index):
+        return self.starts[index] + (self.delta if index >= self.split else 0)
+
+    def end(self, index):
+        return self.ends[index] + (self.delta if index >= self.split else 0)
+
+    def match(self, index):
+        return self.start(index), self.end(index)
+
+    def bisect(self, offset):
+        """
+        index of the first match starting at or after offset
+        """
+        low, high = 0, len(self.starts)
+        while low < high:
+            middle = (low + high) // 2
+            if self.start(middle) < offset:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def following(self, offset):
+        """
+        index of the first match at or after offset, wrapping to the
+        first; None if there are no matches
+        """
+        self.refresh()
+        if not self.starts:
+            return None
+        index = self.bisect(offset)
+        return index if index < len(self.starts) else 0
+
+    def preceding(self, offset):
+        """
+        index of the last match before offset, wrapping to the last
+        """
+        self.refresh()
+        if not self.starts:
+            return None
+        return (self.bisect(offset) - 1) % len(self.starts)
+
+    def flush(self):
+        if self.delta:
+            split, delta = self.split, self.delta
+            self.starts[split:] = [start + delta for start in self.starts[split:]]
+            self.ends[split:] = [end + delta for end in self.ends[split:]]
+        self.split = len(self.starts)
+        self.delta = 0
+
+    # scanning
+
+    def matchesIn(self, start, end):
+        """
+        (starts, ends) lists of matches that begin in [start, end)
+        """
+        starts, ends = [], []
+        for (base, match) in findAll(self.document, self.pattern, self.reach,
+                                     start, end, self.chunk):
+            starts.append(base + match.start())
+            ends.append(base + match.end())
+        return starts, ends
+
+    # edits
+
+    def onEdit(self, kind, offset, text):
+        """
+        document edit hook: 'insert' or 'delete' of text at offset
+        """
+        if kind == 'reset' or self.stale or self.multiline:
+            self.stale = True               # rebuilt when next needed
+            self.starts, self.ends = [], []
+            self.split, self.delta = 0, 0
+            return
+        size = len(text)
+        if kind == 'insert':
+            self.shift(offset, offset, size)
+            self.rescan(offset, offset + size)
+        else:
+            self.shift(offset, offset + size, -size)
+            self.rescan(offset, offset)
+
+    def shift(self, start, end, delta):
+        """
+        drop matches overlapping the edited span [start, end) and move
+        those after it by delta, as a pending shift where possible
+        """
+        first = self.bisect(start)
+        if first and self.end(first-1) > start:
+            first -= 1
+        last = max(self.bisect(end), first)
+        if self.delta and self.split != last:
+            self.flush()
+        del self.starts[first:last]
+        del self.ends[first:last]
+        self.split = first
+        self.delta += delta
+
+    def rescan(self, start, end):
+        """
+        replace matches starting near the edited span [start, end),
+        resuming the scan after the last match kept before it, and
+        going on past it until the new matches meet a kept one; so the
+        matches stay the same as a fresh scan's, never overlapping
+        """
+        document = self.document
+        if self.reach is not None:
+            low = max(start - self.reach, 0)
+            high = min(end + self.reach, len(document))
+        else:
+            low = document.lineStart(document.position(start)[0])
+            high = document.lineStart(document.position(end)[0] + 1)
+        first, last = self.bisect(low), self.bisect(high)
+        if first and self.end(first-1) > low:
+            low = self.end(first-1)
+        high = max(high, low)
+        if last > first:
+            high = max(high, self.end(last-1))      # old matches run to here
+
+        starts, ends = self.matchesIn(low, high)
+        pos = max([high] + ends[-1:])
+        while last < len(self.starts) and self.start(last) < pos:
+            reached = self.end(last)                # overlapped: rescan it
+            last += 1
+            if reached > pos:
+                more = self.matchesIn(pos, reached)
+                starts += more[0]
+                ends += more[1]
+                pos = max([reached] + ends[-1:])
+
+        if self.split > first:
+            self.split = max(first, self.split - (last - first))
+        del self.starts[first:last]
+        del self.ends[first:last]
+        if first > self.split:
+            starts = [pos - self.delta for pos in starts]
+            ends = [pos - self.delta for pos in ends]
+        else:
+            self.split += len(starts)
+        self.starts[first:first] = starts
+        self.ends[first:first] = ends
+
+if __name__ == '__main__':
+    # self-check: chunked scans and replacements must equal one pass of
+    # re over the whole text, whatever the chunk size; an index must equal
+    # a fresh scan after any edits
+    import random
+    from piecetable import PieceTable
+
+    keys = [(r'^a+', True), (r'(?m)^a|a$', True), (r'\ba\w*', True),
+            (r'(?<=b)a', True), (r'a(?=b)', True), (r'\s+', True),
+            (r'(a)(b?)', True), ('aa', False), ('  ', False), ('ab', False)]
+    rand = random.Random(0)
+    context = 8                                 # small, to cross it often
+    for trial in range(2000):
+        text = ''.join(rand.choice('aab \n') for n in range(rand.randrange(80)))
+        key, regex = rand.choice(keys)
+        pattern, reach = searchPattern(key, regex=regex)
+        document = PieceTable(text)
+        chunk = rand.randrange(1, 12)
+        found = [(base + match.start(), base + match.end()) for (base, match)
+                 in findAll(document, pattern, reach, chunk=chunk)]
+        assert found == [match.span() for match in pattern.finditer(text)
+                         if match.end() > match.start()], (key, text, chunk)
+
+        replace = r'<\2\1>' if key == r'(a)(b?)' else '-'
+        parts, pos = [], 0
+        for (start, end, new) in replacements(document, pattern, replace,
+                                              regex, reach, chunk):
+            parts += [text[pos:start], new]
+            pos = end
+        expected = pattern.sub(lambda match: match.expand(replace)
+                               if match.group() else '', text)
+        assert ''.join(parts) + text[pos:] == expected, (key, text, chunk)
+
+        index = MatchIndex(document, pattern, reach)
+        for edit in range(5):
+            offset = rand.randrange(len(document) + 1)
+            if offset < len(document) and rand.random() < 0.4:
+                gone = document.get(offset, offset + rand.randrange(1, 4))
+                document.delete(offset, len(gone))
+                index.onEdit('delete', offset, gone)
+            else:
+                new = ''.join(rand.choice('aab \n') for n in range(3))
+                document.insert(offset, new)
+                index.onEdit('insert', offset, new)
+            fresh = MatchIndex(document, pattern, reach)
+            assert ([index.match(i) for i in range(len(index))] ==
+                    [fresh.match(i) for i in range(len(fresh))]), (key, text)
+    print('ok')
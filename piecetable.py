@@ -0,0 +1,388 @@
+"""
+Headless piece-table text document for PyNote; no tkinter here.
+
+The text is a list of pieces, each a slice of an immutable buffer
+string.  Pieces are grouped in blocks of up to blockSize, and each block
+keeps cumulative arrays of its pieces' lengths and newline counts.  The
+blocks' own totals are summed in Fenwick trees.  Offset and line
+lookups and edits are O(log pieces): an edit rebuilds one block's
+arrays (blockSize entries) and updates the trees.  Blocks are never
+changed in place, so snapshots share them and copy just the block list.
+"""
+import bisect, re
+from array import array
+from itertools import accumulate
+
+class Buffer:
+    """
+    an immutable string, with its newline positions found on demand
+    """
+    indexAbove = 64 * 1024          # smaller buffers just count newlines
+
+    def __init__(self, text):
+        self.text = text
+        self.newlines = None
+
+    def __len__(self):
+        return len(self.text)
+
+    def lineBreaks(self):
+        if self.newlines is None:
+            self.newlines = array('q', (match.start() for match in
+                                        re.finditer('\n', self.text)))
+        return self.newlines
+
+    def count(self, start, end):
+        """
+        newlines in text[start:end]
+        """
+        if len(self.text) < self.indexAbove:
+            return self.text.count('\n', start, end)
+        breaks = self.lineBreaks()
+        return bisect.bisect_left(breaks, end) - bisect.bisect_left(breaks, start)
+
+    def nth(self, start, n):
+        """
+        position of the nth (1-based) newline at or after start
+        """
+        if len(self.text) < self.indexAbove:
+            pos = start - 1
+            for i in range(n):
+                pos = self.text.index('\n', pos + 1)
+            return pos
+        breaks = self.lineBreaks()
+        return breaks[bisect.bisect_left(breaks, start) + n - 1]
+
+class Piece:
+    __slots__ = ('buffer', 'start', 'length', 'newlines')
+
+    def __init__(self, buffer, start, length, newlines=None):
+        self.buffer = buffer
+        self.start = start
+        self.length = length
+        if newlines is None:
+            newlines = buffer.count(start, start + length)
+        self.newlines = newlines
+
+    def text(self, start=0, end=None):
+        end = self.length if end is None else end
+        return self.buffer.text[self.start + start:self.start + end]
+
+class Block:
+    """
+    a run of pieces, with their start offsets and the newlines before
+    each, relative to the block; replaced rather than changed
+    """
+    __slots__ = ('pieces', 'starts', 'breaks')
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.starts = [0, *accumulate([piece.length for piece in pieces])]
+        self.breaks = [0, *accumulate([piece.newlines for piece in pieces])]
+
+class Fenwick:
+    """
+    running totals of a list of counts: one count changed, the sum of
+    the first n, or how many leading counts fit in a sum, in O(log n)
+    """
+    def __init__(self, counts):
+        tree = [0] + list(counts)
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def add(self, index, delta):
+        tree = self.tree
+        index += 1
+        while index < len(tree):
+            tree[index] += delta
+            index += index & -index
+
+    def total(self, count):
+        """
+        sum of the first count counts
+        """
+        tree, total = self.tree, 0
+        while count:
+            total += tree[count]
+            count &= count - 1
+        return total
+
+    def fit(self, value):
+        """
+        (n, rest): the most leading counts summing to at most value,
+        and what is left of value after them
+        """
+        tree, count = self.tree, 0
+        size = len(tree)
+        step = 1 << (size - 1).bit_length()
+        while step:
+            probe = count + step
+            if probe < size and tree[probe] <= value:
+                count = probe
+                value -= tree[probe]
+            step >>= 1
+        return count, value
+
+    def copy(self):
+        copy = Fenwick.__new__(Fenwick)
+        copy.tree = list(self.tree)
+        return copy
+
+class PieceTable:
+    """
+    a text document supporting insert/delete by offset, and offset,
+    line and column lookups, all in O(log pieces)
+    """
+    growLimit = 4096                # typed runs are merged up to this size
+    blockSize = 256                 # blocks are split above this many pieces
+
+    def __init__(self, text=''):
+        self.setText(text)
+
+    def setText(self, text):
+        pieces = [Piece(Buffer(text), 0, len(text))] if text else []
+        self.blocks = [Block(pieces)] if pieces else []
+        self.reindex()
+
+    def reindex(self):
+        """
+        rebuild the block totals, after blocks were added or removed
+        """
+        self.blockLengths = Fenwick(block.starts[-1] for block in self.blocks)
+        self.blockBreaks = Fenwick(block.breaks[-1] for block in self.blocks)
+        self.size = sum(block.starts[-1] for block in self.blocks)
+        self.breaks = sum(block.breaks[-1] for block in self.blocks)
+
+    def replaceBlocks(self, first, last, pieceLists):
+        """
+        replace blocks[first:last] with blocks of the given piece lists,
+        splitting long lists and dropping empty ones
+        """
+        blocks, size = [], self.blockSize
+        for pieces in pieceLists:
+            parts = max(1, -(-len(pieces) // size))
+            for part in range(parts):
+                chunk = pieces[part * len(pieces) // parts:
+                               (part + 1) * len(pieces) // parts]
+                if chunk:
+                    blocks.append(Block(chunk))
+        old = self.blocks[first:last]
+        self.blocks[first:last] = blocks
+        if len(blocks) != len(old):
+            self.reindex()
+            return
+        for (index, (block, gone)) in enumerate(zip(blocks, old), first):
+            length = block.starts[-1] - gone.starts[-1]
+            newlines = block.breaks[-1] - gone.breaks[-1]
+            self.blockLengths.add(index, length)
+            self.blockBreaks.add(index, newlines)
+            self.size += length
+            self.breaks += newlines
+
+    def __len__(self):
+        return self.size
+
+    def isEmpty(self):
+        return self.size == 0
+
+    def lineCount(self):
+        return self.breaks + 1
+
+    # lookups
+
+    def find(self, offset):
+        """
+        (block index, piece index in block, offset within piece) of
+        offset; the text's end is (len(blocks), 0, 0)
+        """
+        index, within = self.blockLengths.fit(offset)
+        if index == len(self.blocks):
+            return index, 0, 0
+        block = self.blocks[index]
+        piece = bisect.bisect_right(block.starts, within) - 1
+        return index, piece, within - block.starts[piece]
+
+    def place(self, offset):
+        """
+        find(offset), but an offset between blocks is given as the end
+        of the earlier block, where inserts go
+        """
+        index, piece, within = self.find(offset)
+        if piece == 0 and within == 0 and index > 0:
+            index -= 1
+            piece = len(self.blocks[index].pieces)
+        return index, piece, within
+
+    def lineStart(self, line):
+        """
+        offset of 1-based line's first character, clamped to the text
+        """
+        if line <= 1:
+            return 0
+        if line > self.lineCount():
+            return len(self)
+        # the block holding the line's newline: past those with fewer
+        # than line - 1 newlines in all, then the count left within it
+        index, want = self.blockBreaks.fit(line - 2)
+        want += 1
+        block = self.blocks[index]
+        which = bisect.bisect_left(block.breaks, want) - 1
+        piece = block.pieces[which]
+        pos = piece.buffer.nth(piece.start, want - block.breaks[which])
+        return (self.blockLengths.total(index) + block.starts[which] +
+                pos - piece.start + 1)
+
+    def offset(self, line, col=0):
+        """
+        offset of 1-based line, 0-based column; columns past the end
+        of the line are clamped to it, like Tk text indexes
+        """
+        start = self.lineStart(line)
+        if line >= self.lineCount():
+            return min(start + col, len(self))
+        return min(start + col, self.lineStart(line + 1) - 1)
+
+    def position(self, offset):
+        """
+        (1-based line, 0-based column) of offset
+        """
+        offset = max(0, min(offset, len(self)))
+        index, which, within = self.find(offset)
+        line = self.blockBreaks.total(index) + 1
+        if index < len(self.blocks):
+            block = self.blocks[index]
+            piece = block.pieces[which]
+            line += block.breaks[which]
+            line += piece.buffer.count(piece.start, piece.start + within)
+        return line, offset - self.lineStart(line)
+
+    # reading
+
+    def chunks(self, start=0, end=None, size=None):
+        """
+        generator: the text from start to end, a piece (or at most
+        size characters) at a time
+        """
+        end = len(self) if end is None else min(end, len(self))
+        if start >= end:
+            return
+        index, which, within = self.find(start)
+        pieces = self.blocks[index].pieces
+        pos = start
+        while pos < end:
+            piece = pieces[which]
+            take = min(piece.length - within, end - pos)
+            if size:
+                take = min(take, size)
+            yield piece.text(within, within + take)
+            pos += take
+            within += take
+            if within == piece.length:
+                which += 1
+                within = 0
+                if which == len(pieces) and pos < end:
+                    index, which = index + 1, 0
+                    pieces = self.blocks[index].pieces
+
+    def get(self, start=0, end=None):
+        return ''.join(self.chunks(start, end))
+
+    def getText(self):
+        if len(self.blocks) == 1 and len(self.blocks[0].pieces) == 1:
+            return self.blocks[0].pieces[0].text()
+        return ''.join(self.chunks())
+
+    def line(self, line):
+        """
+        text of 1-based line, without its newline
+        """
+        start = self.lineStart(line)
+        if line >= self.lineCount():
+            return self.get(start)
+        return self.get(start, self.lineStart(line + 1) - 1)
+
+    def snapshot(self):
+        """
+        frozen copy sharing this document's buffers and blocks:
+        O(pieces / blockSize)
+        """
+        copy = PieceTable.__new__(PieceTable)
+        copy.blocks = list(self.blocks)
+        copy.blockLengths = self.blockLengths.copy()
+        copy.blockBreaks = self.blockBreaks.copy()
+        copy.size = self.size
+        copy.breaks = self.breaks
+        return copy
+
+    # editing
+
+    def insert(self, offset, text):
+        if not text:
+            return
+        offset = max(0, min(offset, len(self)))
+        index, which, within = self.place(offset)
+        if index == len(self.blocks):               # empty document
+            piece = Piece(Buffer(text), 0, len(text))
+            self.replaceBlocks(index, index, [[piece]])
+            return
+        pieces = list(self.blocks[index].pieces)
+
+        # typing: grow the preceding piece if it ends its own buffer
+        if within == 0 and which > 0:
+            prior = pieces[which-1]
+            buffer = prior.buffer
+            if (prior.start + prior.length == len(buffer) and
+                    len(buffer) + len(text) <= self.growLimit):
+                grown = Buffer(buffer.text + text)
+                pieces[which-1] = Piece(grown, prior.start,
+                                        prior.length + len(text),
+                                        prior.newlines + text.count('\n'))
+                self.replaceBlocks(index, index + 1, [pieces])
+                return
+
+        new = Piece(Buffer(text), 0, len(text))
+        if within == 0:
+            pieces.insert(which, new)
+        else:
+            piece = pieces[which]
+            pieces[which:which+1] = self.split(piece, within, new)
+        self.replaceBlocks(index, index + 1, [pieces])
+
+    def split(self, piece, within, *middle):
+        left = Piece(piece.buffer, piece.start, within)
+        right = Piece(piece.buffer, piece.start + within,
+                      piece.length - within, piece.newlines - left.newlines)
+        return [left, *middle, right]
+
+    def delete(self, offset, length):
+        """
+        delete length characters at offset, returning them
+        """
+        end = min(offset + length, len(self))
+        offset = max(0, offset)
+        if offset >= end:
+            return ''
+        deleted = self.get(offset, end)
+        first, which, head = self.find(offset)
+        last, until, tail = self.find(end)
+        pieces = self.blocks[first].pieces
+        keep = pieces[:which]
+        if head:
+            keep.append(Piece(pieces[which].buffer, pieces[which].start, head))
+        if last < len(self.blocks):
+            pieces = self.blocks[last].pieces
+            if tail:
+                piece = pieces[until]
+                keep.append(Piece(piece.buffer, piece.start + tail,
+                                  piece.length - tail))
+                until += 1
+            keep += pieces[until:]
+            last += 1
+        self.replaceBlocks(first, last, [keep])
+        return deleted
+
+    def append(self, text):
+        self.insert(len(self), text)
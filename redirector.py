@@ -0,0 +1,45 @@
+"""
+Route a Tk widget's Tcl command through Python, so that chosen widget
+operations can be intercepted: the widget command is renamed, and a
+Python command takes its name.  Tk's own bindings call the widget by
+name, so typing, pasting and dragging go through here as well.
+"""
+from tkinter import TclError
+
+class WidgetRedirector:
+    def __init__(self, widget):
+        self.operations = {}
+        self.widget = widget
+        self.tk = widget.tk
+        self.orig = widget._w + '_orig'
+        self.tk.call('rename', widget._w, self.orig)
+        self.tk.createcommand(widget._w, self.dispatch)
+        if widget._tclCommands is None:         # deleted on destroy
+            widget._tclCommands = []
+        widget._tclCommands.append(widget._w)
+
+    def register(self, operation, function):
+        """
+        call function(*args) instead of the widget's operation
+        """
+        self.operations[operation] = function
+
+    def unregister(self, operation):
+        return self.operations.pop(operation, None)
+
+    def original(self, operation, *args):
+        """
+        run operation on the real widget, bypassing any redirection
+        """
+        return self.tk.call((self.orig, operation) + args)
+
+    def dispatch(self, operation, *args):
+        # a Python exception here would be re-raised later by mainloop,
+        # so Tcl errors become empty results, as in IDLE's redirector
+        function = self.operations.get(operation)
+        try:
+            if function:
+                return function(*args)
+            return self.tk.call((self.orig, operation) + args)
+        except TclError:
+            return ''
@@ -0,0 +1,176 @@
+"""
+Python syntax scanning for PyNote's highlighter; no tkinter here.
+
+Text is scanned a line at a time, given the state at the line's start:
+'' normally, or the quotes of a string still open from a line above.
+The start state of every line is kept, so after an edit only the lines
+from the edit on are rescanned, until the state at a line's start is
+the same as it was before: nothing below can have changed.
+"""
+import builtins, keyword, re
+
+def anyOf(name, alternates):
+    return '(?P<%s>%s)' % (name, '|'.join(alternates))
+
+def wordsOf(names):
+    return r'(?<![\w.])(?:%s)\b' % '|'.join(sorted(names, key=len, reverse=True))
+
+builtinNames = [name for name in dir(builtins) if not name.startswith('_')]
+
+tokenPattern = re.compile('|'.join([
+    anyOf('comment', [r'\#[^\n]*']),
+    anyOf('quote', [r'(?i:rb|br|fr|rf|[rbuf])?(?P<quotes>\'\'\'|"""|\'|")']),
+    anyOf('decorator', [r'^[ \t]*@[\w.]+']),
+    anyOf('keyword', [wordsOf(keyword.kwlist)]),
+    anyOf('builtin', [wordsOf(builtinNames)]),
+    anyOf('number', [r'\b0[xXoObB][\da-fA-F_]+\b',
+                     r'\b\d[\d_]*\.?[\d_]*(?:[eE][+-]?\d+)?[jJ]?\b']),
+]))
+namePattern = re.compile(r'\s+(\w+)')
+
+def closeQuote(line, pos, quotes):
+    """
+    offset just past the quotes closing a string at or after pos,
+    or -1 if the string is still open at the end of the line
+    """
+    while True:
+        end = line.find(quotes, pos)
+        if end < 0:
+            return -1
+        slashes = end
+        while slashes > pos and line[slashes-1] == '\\':
+            slashes -= 1
+        if (end - slashes) % 2 == 0:
+            return end + len(quotes)
+        pos = end + 1
+
+def openAfter(line, quotes):
+    """
+    state for the next line when a string is open at the end of this one:
+    triple quotes stay open, others only after a continuation backslash
+    """
+    if len(quotes) == 3:
+        return quotes
+    trailing = len(line) - len(line.rstrip('\\'))
+    return quotes if trailing % 2 else ''
+
+def scanLine(line, state=''):
+    """
+    ([(start col, end col, kind)...], state at the next line's start)
+    for one line of text without its newline
+    """
+    tokens = []
+    pos = 0
+    if state:
+        end = closeQuote(line, 0, state)
+        if end < 0:
+            return [(0, len(line), 'string')], openAfter(line, state)
+        tokens.append((0, end, 'string'))
+        pos = end
+    while True:
+        match = tokenPattern.search(line, pos)
+        if not match:
+            return tokens, ''
+        kind = match.lastgroup
+        if kind == 'quote':
+            quotes = match.group('quotes')
+            end = closeQuote(line, match.end(), quotes)
+            if end < 0:
+                tokens.append((match.start(), len(line), 'string'))
+                return tokens, openAfter(line, quotes)
+            tokens.append((match.start(), end, 'string'))
+            pos = end
+            continue
+        tokens.append((match.start(), match.end(), kind))
+        pos = match.end()
+        if kind == 'keyword' and match.group() in ('def', 'class'):
+            name = namePattern.match(line, pos)
+            if name:
+                tokens.append((name.start(1), name.end(1), 'definition'))
+                pos = name.end()
+
+def scanStates(document, low, state, old, high, count):
+    """
+    scan up to count lines from 0-based line low, whose start state is
+    state; old holds the recorded start states of the lines after low.
+    Returns (new start states of lines low+1..., next line to scan), or
+    None for the next line once past high and back in step with old
+    """
+    total = document.lineCount()
+    stop = min(low + count, total - 1)
+    if stop <= low:
+        return [], None
+    text = document.get(document.lineStart(low + 1),
+                        document.lineStart(stop + 1))
+    new = []
+    for (i, line) in enumerate(text.split('\n')[:stop - low]):
+        tokens, state = scanLine(line, state)
+        new.append(state)
+        if low + i + 1 >= high and i < len(old) and old[i] == state:
+            return new, None
+    return new, (stop if stop < total - 1 else None)
+
+class LineStates:
+    """
+    the start state of each line, None where not known yet, and the
+    range of lines that must be rescanned after edits
+    """
+    def __init__(self, lines=1):
+        self.reset(lines)
+
+    def reset(self, lines):
+        self.states = [''] + [None] * (lines - 1)
+        self.low, self.high = 0, lines          # to rescan: [low, high)
+
+    def dirty(self):
+        return self.low < self.high
+
+    def onEdit(self, line, added, removed):
+        """
+        0-based line was edited, gaining added and losing removed lines
+        """
+        states = self.states
+        del states[line+1:line+1+removed]
+        states[line+1:line+1] = [None] * added
+        if self.dirty():
+            if self.high > line:
+                self.high = max(self.high + added - removed, line + 1)
+            self.low = min(self.low, line)
+            self.high = max(self.high, line + added + 1)
+        else:
+            self.low, self.high = line, line + added + 1
+
+    def job(self, count):
+        """
+        (low, start state, recorded states after low) for the next scan
+        """
+        low = self.low
+        while self.states[low] is None:
+            low -= 1                            # line 0 is always known
+        return low, self.states[low], self.states[low+1:low+1+count]
+
+    def update(self, low, new, next):
+        self.states[low+1:low+1+len(new)] = new
+        if next is None:
+            self.low = self.high = 0
+        else:
+            self.low = next
+            self.high = max(self.high, next + 1)
+
+    def stateAt(self, line, document, limit=1000):
+        """
+        start state of 0-based line, scanning forward from the nearest
+        known state within limit lines, else assuming plain code
+        """
+        start = min(line, len(self.states) - 1)
+        while self.states[start] is None and line - start < limit:
+            start -= 1
+        state = self.states[start]
+        if state is None:
+            return ''                           # not scanned this far yet
+        if start < line:
+            text = document.get(document.lineStart(start + 1),
+                                document.lineStart(line + 1))
+            for text in text.split('\n')[:line - start]:
+                tokens, state = scanLine(text, state)
+        return state
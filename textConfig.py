@@ -13,14 +13,101 @@ fg = 'black'
 height = 40
 width = 80
 
-# search case-insensitive
+# search case-insensitive, and search for Python regexes
 caseinsens = True
+searchRegex = False
+
+# Replace All edits matches one by one up to this many, else it
+# rewrites the span they cover in one widget edit
+replaceBatchAbove = 64
+
+# highlight-all while typing in the replace dialog's Find entry: delay
+# after the last keystroke (ms), and characters tagged beyond the view
+highlightDelay = 200
+highlightMargin = 20000
+highlightBg = 'yellow'
+
+# start with word wrap on; lines longer than longLineLimit characters
+# (0 is off) show only the first longLinePreview, until expanded;
+wordWrap = False
+longLineLimit = 20000
+longLinePreview = 2000
+longLineMark = 'orange'
+
+# show the status bar and line-number gutter at startup
+statusBar = True
+lineNumbers = False
+gutterBg = 'gray92'
+
+# Python syntax colouring, for files with these extensions
+syntaxHighlight = True
+syntaxExtensions = ('.py', '.pyw')
+syntaxColours = {'comment': 'red', 'string': 'darkgreen',
+                 'keyword': 'orange', 'builtin': 'purple',
+                 'definition': 'blue', 'decorator': 'brown',
+                 'number': 'black'}
+
+# open files from later runs in this PyNote (Unix only); same as
+# running with --single-instance
+singleInstance = False
+
+# journal edits for recovery after a crash, in journalDir (default
+# ~/.pynote/recovery); journals past journalCompactAbove bytes are
+# restarted from a snapshot;
+journal = True
+journalDir = ''
+journalCompactAbove = 16 * 1024 * 1024
+
+# undo history is trimmed from its oldest steps past undoBudget
+# bytes; deleted text longer than undoPackAbove is kept compressed;
+undoBudget = 32 * 1024 * 1024
+undoPackAbove = 4096
+
+# inserts (pastes) longer than insertChunkAbove characters go in
+# chunks, with progress and Cancel;
+insertChunkAbove = 1024 * 1024
+insertChunkSize = 256 * 1024
+
+# Find in Files stops after this many hits
+findMaxResults = 10000
+
+# Compare with... backgrounds for removed, added and current lines
+compareColours = {'removed': '#ffd8d8', 'added': '#d8ffd8',
+                  'current': '#ffff99'}
+
+# time menu commands and key bindings, to the next idle; commands
+# over commandSlowMs are logged with a stack sample to commandLog
+# (stderr if ''), as are statistics at exit
+commandTiming = False
+commandSlowMs = 100
+commandLog = ''
 
 # Unicode encoding behaviour and names for file opens and saves;
 
 openAskUser = True
 openEncoding = ''
 
+# sniff a sample of each file's bytes for its encoding; the user is
+# only asked when the best guess scores below openAskConfidence (0..1)
+# and then fails to decode the whole file
+openDetect = True
+openAskConfidence = 0.9
+
 savesUseKnownEncoding = 1
 savesAskUser = True
 savesEncoding = ''
+
+# saves are encoded and written this many characters at a time,
+# to a temporary file that replaces the original when complete;
+saveChunkSize = 256 * 1024
+
+# seconds between background saves of changed, named files; 0 is off
+autosaveInterval = 0
+
+# file opens are decoded and inserted this many bytes at a time;
+loadChunkSize = 256 * 1024
+
+# files bigger than this (bytes) are offered in the read-only viewer,
+# which maps the file and shows only the lines in sight;
+viewThreshold = 512 * 1024 * 1024
+viewCopyLimit = 64 * 1024 * 1024
@@ -0,0 +1,170 @@
+"""
+File input/output helpers for PyNote;
+no tkinter here, so these can be used and timed headless.
+"""
+import codecs, io, mmap, os, tempfile
+
+umask = os.umask(0)     # read once at import: reading it means setting it,
+os.umask(umask)         # which would race saves in worker threads
+
+def openBytes(filename):
+    """
+    map a file read-only, so its bytes are read once and shared by
+    every decode attempt; empty files give b'' (mmap refuses them)
+    """
+    with open(filename, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def closeBytes(data):
+    if isinstance(data, mmap.mmap):
+        data.close()
+
+def decodeChunks(data, encoding, chunksize=65536, start=0):
+    """
+    generator: decode data incrementally, chunksize bytes at a time,
+    with universal newlines; yields (bytesdone, text) pairs;
+    raises UnicodeError or LookupError if encoding is a bad guess
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    decoder = io.IncrementalNewlineDecoder(decoder, translate=True)
+    size = len(data)
+    pos = start
+    while True:
+        end = min(pos + chunksize, size)
+        final = end == size
+        text = decoder.decode(data[pos:end], final)
+        pos = end
+        if text or final:
+            yield pos, text
+        if final:
+            break
+
+# byte order marks, longest first: utf-32 LE starts like utf-16 LE
+BOMS = [(codecs.BOM_UTF32_LE, 'utf-32'),
+        (codecs.BOM_UTF32_BE, 'utf-32'),
+        (codecs.BOM_UTF8,     'utf-8-sig'),
+        (codecs.BOM_UTF16_LE, 'utf-16'),
+        (codecs.BOM_UTF16_BE, 'utf-16')]
+
+def sampleDecodes(sample, encoding, final):
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(sample, final)
+    except (UnicodeError, LookupError):
+        return False
+    return True
+
+def detectEncoding(data, preferred='', samplesize=64 * 1024):
+    """
+    guess data's encoding from a bounded sample of its bytes; returns
+    a list of (encoding, confidence) pairs, best first, where 1.0 means
+    certain (a BOM, or the sample is the whole file and decodes)
+    """
+    sample = bytes(data[:samplesize])
+    whole = len(sample) == len(data)
+    guesses = []
+
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return [(encoding, 1.0)]
+
+    # utf-16 without a BOM: mostly-ASCII text has nulls in every other byte
+    pairs = len(sample) // 2
+    if pairs:
+        evens = sample[0:pairs*2:2].count(0) / pairs
+        odds = sample[1:pairs*2:2].count(0) / pairs
+        for encoding, nulls, other in (('utf-16-le', odds, evens),
+                                       ('utf-16-be', evens, odds)):
+            if nulls > 0.3 and other < 0.05:
+                if sampleDecodes(sample, encoding, whole):
+                    guesses.append((encoding, 1.0 if whole else 0.9))
+
+    # utf-8: multibyte sequences that decode are strong evidence,
+    # pure ASCII only says some ASCII superset will do
+    if 0 not in sample and sampleDecodes(sample, 'utf-8', whole):
+        if whole:
+            confidence = 1.0
+        elif sample.isascii():
+            confidence = 0.8
+        else:
+            confidence = 0.95
+        guesses.append(('utf-8', confidence))
+
+    if preferred and sampleDecodes(sample, preferred, whole):
+        if not any(codecs.lookup(preferred).name == codecs.lookup(enc).name
+                   for (enc, conf) in guesses):
+            guesses.append((preferred, 1.0 if whole else 0.7))
+
+    guesses.sort(key=lambda guess: guess[1], reverse=True)
+    return guesses
+
+class EncodeError(UnicodeError):
+    """
+    a character that the save encoding cannot represent, with its
+    1-based line and column in the text
+    """
+    def __init__(self, encoding, char, line, col):
+        UnicodeError.__init__(self, encoding, char, line, col)
+        self.encoding, self.char, self.line, self.col = (encoding, char,
+                                                         line, col)
+
+    def __str__(self):
+        return '%s cannot encode %r at line %d, column %d' % (
+                self.encoding, self.char, self.line, self.col)
+
+def encodeChunks(chunks, encoding, newline=os.linesep):
+    """
+    generator: encode text chunks incrementally, translating newlines;
+    raises EncodeError for the first character that won't encode
+    """
+    encoder = codecs.getincrementalencoder(encoding)()
+    line, col = 1, 0                    # position at start of chunk
+    for chunk in chunks:
+        text = chunk if newline == '\n' else chunk.replace('\n', newline)
+        try:
+            yield encoder.encode(text)
+        except UnicodeEncodeError as why:
+            before = text.count('\n', 0, why.start)
+            if before:
+                col = why.start - text.rfind('\n', 0, why.start) - 1
+            else:
+                col += why.start
+            raise EncodeError(encoding, text[why.start], line + before,
+                              col + 1) from None
+        newlines = chunk.count('\n')
+        if newlines:
+            col = len(chunk) - chunk.rfind('\n') - 1
+        else:
+            col += len(chunk)
+        line += newlines
+    yield encoder.encode('', True)
+
+def saveChunks(filename, chunks, encoding, newline=os.linesep):
+    """
+    encode and write text chunks to a temporary file in the target's
+    folder, flush it to disk, then rename it over the target, so a
+    failed save never leaves a truncated file; memory use is a chunk.
+    A symlink is followed, so its target is replaced, not the link
+    """
+    filename = os.path.realpath(filename)
+    folder, name = os.path.split(filename)
+    handle, temp = tempfile.mkstemp(prefix='.' + name + '.', suffix='.tmp',
+                                    dir=folder)
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            for data in encodeChunks(chunks, encoding, newline):
+                file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(filename):
+            os.chmod(temp, os.stat(filename).st_mode & 0o7777)
+        else:
+            os.chmod(temp, 0o666 & ~umask)
+        os.replace(temp, filename)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,246 @@
+"""
+Undo history for PyNote's document model, in place of Tk's own
+unbounded stack; no tkinter here.
+
+Each undo step is a list of edits.  Typed characters and runs of
+backspaces or deletes are merged into one step; an insert keeps just
+its offset and length while it can be undone, since its text is in
+the document until then; large deleted text is kept zlib-compressed.
+The history is trimmed from its oldest steps whenever its estimated
+size passes a budget, so memory stays flat however long the session.
+"""
+import zlib
+from collections import deque
+
+class Edit:
+    __slots__ = ('kind', 'offset', 'length', 'text', 'packed')
+    overhead = 64                       # rough bytes per edit object
+
+    def __init__(self, kind, offset, length, text=None):
+        self.kind = kind                # 'insert' or 'delete'
+        self.offset = offset
+        self.length = length
+        self.text = text
+        self.packed = None
+
+    def store(self, text, packAbove):
+        if len(text) > packAbove:
+            self.text = None
+            self.packed = zlib.compress(text.encode('utf-8', 'surrogatepass'))
+        else:
+            self.text = text
+            self.packed = None
+
+    def fetch(self):
+        if self.packed is not None:
+            return zlib.decompress(self.packed).decode('utf-8', 'surrogatepass')
+        return self.text
+
+    def forget(self):
+        self.text = self.packed = None
+
+    def cost(self):
+        if self.packed is not None:
+            return self.overhead + len(self.packed)
+        return self.overhead + (len(self.text) if self.text else 0)
+
+class Step:
+    __slots__ = ('edits', 'cost', 'id', 'typing')
+
+    def __init__(self, id):
+        self.edits = []
+        self.cost = 0
+        self.id = id
+        self.typing = False             # more typed edits may merge in
+
+class UndoHistory:
+    """
+    undo/redo steps within a memory budget; onEdit is a document edit
+    hook, and undo/redo replay steps through the given callables
+    """
+    def __init__(self, budget=32 * 1024 * 1024, packAbove=4096):
+        self.budget = budget
+        self.packAbove = packAbove
+        self.reset()
+
+    def reset(self):
+        self.undos = deque()
+        self.redos = []
+        self.memory = 0
+        self.nextId = 1
+        self.cleanId = 0                # top step id when last saved
+        self.depth = 0                  # open groups
+        self.applying = False           # our own edits: not recorded
+
+    def usage(self):
+        """
+        estimated bytes held by the history
+        """
+        return self.memory
+
+    def separate(self):
+        """
+        the next edit starts a new step
+        """
+        if self.undos:
+            self.undos[-1].typing = False
+
+    def markClean(self):
+        self.separate()
+        self.cleanId = self.undos[-1].id if self.undos else 0
+
+    def atClean(self):
+        return self.cleanId == (self.undos[-1].id if self.undos else 0)
+
+    def beginGroup(self):
+        """
+        edits up to the matching endGroup are one step
+        """
+        if self.depth == 0:
+            self.separate()
+            self.push()
+        self.depth += 1
+
+    def endGroup(self):
+        if self.depth == 0:
+            return                              # reset while open
+        self.depth -= 1
+        if self.depth == 0:
+            if self.undos and not self.undos[-1].edits:
+                self.undos.pop()
+            self.separate()
+
+    # recording
+
+    def onEdit(self, kind, offset, text):
+        if self.applying:
+            return
+        if kind == 'reset':
+            self.reset()
+            return
+        self.dropRedos()
+        step = self.undos[-1] if self.undos else None
+        typed = len(text) == 1 and self.depth == 0
+        joins = typed and step and step.typing
+        if self.depth and kind == 'insert' and step.edits:
+            joins = True                        # chunks of one big insert
+        if not (joins and self.merge(step, kind, offset, text)):
+            if self.depth == 0:
+                step = self.push()
+            edit = Edit(kind, offset, len(text))
+            if kind == 'delete':
+                edit.store(text, self.packAbove)
+            step.edits.append(edit)
+            self.charge(step, edit.cost())
+        step.typing = typed and text != '\n'
+        self.trim()
+
+    def merge(self, step, kind, offset, text):
+        """
+        fold a typed character (or a grouped insert) into the last
+        edit of step, if adjacent
+        """
+        edit = step.edits[-1]
+        if kind != edit.kind:
+            return False
+        if kind == 'insert':
+            if offset != edit.offset + edit.length:
+                return False
+        elif offset == edit.offset:
+            edit.text += text                   # Delete key
+        elif offset + 1 == edit.offset:
+            edit.text = text + edit.text        # BackSpace
+            edit.offset = offset
+        else:
+            return False
+        edit.length += len(text)
+        self.charge(step, len(text) if kind == 'delete' else 0)
+        return True
+
+    def push(self):
+        step = Step(self.nextId)
+        self.nextId += 1
+        self.undos.append(step)
+        return step
+
+    def charge(self, step, cost):
+        step.cost += cost
+        self.memory += cost
+
+    def dropRedos(self):
+        for step in self.redos:
+            self.memory -= step.cost
+        self.redos = []
+
+    def trim(self):
+        """
+        forget the oldest steps, then the furthest redos, over budget
+        """
+        while self.memory > self.budget and len(self.undos) > 1:
+            self.memory -= self.undos.popleft().cost
+        while self.memory > self.budget and self.redos:
+            self.memory -= self.redos.pop(0).cost
+
+    # replay
+
+    def undo(self, get, insert, delete):
+        """
+        undo the last step via get(start, end), insert(offset, text)
+        and delete(offset, length); returns the offset of the last
+        change, or None if there is nothing to undo
+        """
+        if not self.undos:
+            return None
+        step = self.undos.pop()
+        self.memory -= step.cost
+        step.cost = 0
+        where = None
+        self.applying = True
+        try:
+            for edit in reversed(step.edits):
+                if edit.kind == 'insert':
+                    edit.store(get(edit.offset, edit.offset + edit.length),
+                               self.packAbove)
+                    delete(edit.offset, edit.length)
+                    where = edit.offset
+                else:
+                    text = edit.fetch()
+                    insert(edit.offset, text)
+                    where = edit.offset + len(text)
+                step.cost += edit.cost()
+        finally:
+            self.applying = False
+        step.typing = False
+        self.redos.append(step)
+        self.memory += step.cost
+        self.trim()
+        return where
+
+    def redo(self, get, insert, delete):
+        """
+        redo the last undone step; as for undo
+        """
+        if not self.redos:
+            return None
+        step = self.redos.pop()
+        self.memory -= step.cost
+        step.cost = 0
+        where = None
+        self.applying = True
+        try:
+            for edit in step.edits:
+                if edit.kind == 'insert':
+                    text = edit.fetch()
+                    insert(edit.offset, text)
+                    edit.forget()               # in the document again
+                    where = edit.offset + len(text)
+                else:
+                    delete(edit.offset, edit.length)
+                    where = edit.offset
+                step.cost += edit.cost()
+        finally:
+            self.applying = False
+        self.undos.append(step)
+        self.memory += step.cost
+        self.trim()
+        return where